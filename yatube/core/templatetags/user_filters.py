@@ -2,7 +2,34 @@ from django import template
 
 register = template.Library()
 
+# Сколько номеров страниц выводится по обе стороны от текущей.
+PAGE_WINDOW = 5
+
 
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.filter
+def page_window(page_obj, size=PAGE_WINDOW):
+    """Номера страниц вокруг текущей вместо всего page_range.
+
+    На большой ленте page_range — тысячи ссылок, которые рендерились
+    на каждой странице.
+    """
+    first = max(page_obj.number - size, 1)
+    last = min(page_obj.number + size, page_obj.paginator.num_pages)
+    return range(first, last + 1)
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """Ссылка на другую страницу с сохранением прочих GET-параметров.
+
+    {% page_url page=2 %} на странице ?q=котики даёт ?q=котики&page=2.
+    """
+    query = context['request'].GET.copy()
+    for key, value in params.items():
+        query[key] = value
+    return '?' + query.urlencode()
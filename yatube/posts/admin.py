@@ -1,9 +1,58 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.urls import reverse
+from django.utils.html import format_html
 
+from . import search
 from .models import Post, Group, Comment, Follow
+from .utils import EstimatedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class ScalableAdmin(admin.ModelAdmin):
+    """Общие настройки списков, в которых миллионы строк.
+
+    Число строк оценивается без COUNT(*) по таблице, а второй COUNT(*)
+    для «всего N» при поиске и фильтрах не выполняется.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """Автодополнение, которому выбранный объект передан готовым.
+
+    Обычный виджет читает подпись выбранного значения отдельным запросом,
+    то есть в списке с list_editable — по запросу на строку.
+    """
+    loaded = None
+
+    def optgroups(self, name, value, attr=None):
+        loaded = self.loaded
+        if loaded is None or [str(loaded.pk)] != list(value):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, loaded.pk, self.choices.field.label_from_instance(loaded),
+            True, len(options),
+        ))
+        return [(None, options, 0)]
+
+
+class PostChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields.get('group')
+        if field is not None:
+            # Админка оборачивает виджет в RelatedFieldWidgetWrapper.
+            widget = getattr(field.widget, 'widget', field.widget)
+            widget.loaded = self.instance.group
+
+
+class PostAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,10 +61,33 @@ class PostAdmin(admin.ModelAdmin):
         'group',
         'image',
     )
+    list_select_related = ('author', 'group')
+    # Выбор группы в строке списка подгружается поиском, а не выводит
+    # все группы в каждой строке.
     list_editable = ('group',)
+    autocomplete_fields = ('group',)
+    raw_id_fields = ('author',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+    # Переходы по датам — диапазоны по индексу post_date_idx.
+    date_hierarchy = 'pub_date'
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = LoadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -30,28 +102,38 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'text',
         'created',
         'author',
-        'post',
+        'post_link',
     )
+    list_select_related = ('author',)
+    raw_id_fields = ('author', 'post')
     search_fields = ('text',)
     list_filter = ('created',)
-    empty_value_display = '-пусто-'
+    # Переходы по датам — диапазоны по индексу comment_created_idx.
+    date_hierarchy = 'created'
 
+    def post_link(self, comment):
+        """Ссылка на пост по post_id, без чтения самого поста."""
+        url = reverse('admin:posts_post_change', args=(comment.post_id,))
+        return format_html('<a href="{}">#{}</a>', url, comment.post_id)
+    post_link.short_description = 'Пост'
+    post_link.admin_order_field = 'post'
 
-class FollowAdmin(admin.ModelAdmin):
+
+class FollowAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'user',
         'author',
     )
-    search_fields = ('user',)
-    list_filter = ('user',)
-    empty_value_display = '-пусто-'
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
 
 
 admin.site.register(Post, PostAdmin)
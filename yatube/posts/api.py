@@ -0,0 +1,138 @@
+"""JSON-версии лент для мобильного приложения.
+
+Отдают те же посты, что index, group_posts, profile и follow_index, но
+без рендеринга шаблонов: строки читаются через values_list() и
+сериализуются как есть. Листаются только курсором, параметр fields=
+оставляет в ответе лишь нужные поля. ETag и Last-Modified вычисляются
+теми же валидаторами, что у HTML-страниц. Ссылки next/previous
+относительные: страницы для гостей кэшируются по пути, без хоста.
+"""
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition
+
+from . import conditional
+from .models import Group, Post, User
+from .timeline import follow_feed
+from .utils import CURSOR_PARAM, CursorPaginator
+
+FIELDS_PARAM = 'fields'
+# Поле ответа -> поле values_list().
+FIELDS = {
+    'id': 'id',
+    'pub_date': 'pub_date',
+    'text': 'text',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'comments_count': 'comments_count',
+}
+# Без них не построить курсор следующей страницы.
+CURSOR_FIELDS = ('id', 'pub_date')
+
+
+def requested_fields(request):
+    """Поля из параметра fields= или все; для неизвестных — None."""
+    raw = request.GET.get(FIELDS_PARAM)
+    if not raw:
+        return tuple(FIELDS)
+    fields = tuple(dict.fromkeys(
+        field.strip() for field in raw.split(',') if field.strip()
+    ))
+    if not fields or set(fields) - set(FIELDS):
+        return None
+    return fields
+
+
+def post_rows(posts, fields):
+    """posts как именованные кортежи только с нужными столбцами."""
+    columns = dict.fromkeys(CURSOR_FIELDS + fields)
+    return posts.values_list(*(FIELDS[field] for field in columns), named=True)
+
+
+def serialize(row, fields):
+    storage = Post._meta.get_field('image').storage
+    item = {}
+    for field in fields:
+        value = getattr(row, FIELDS[field])
+        if field == 'image':
+            value = storage.url(value) if value else None
+        item[field] = value
+    return item
+
+
+def page_link(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query[CURSOR_PARAM] = cursor
+    return f'{request.path}?{query.urlencode()}'
+
+
+def bad_fields():
+    return JsonResponse({
+        'error': 'Неизвестное поле в fields',
+        'fields': list(FIELDS),
+    }, status=400)
+
+
+def feed_response(request, rows, fields):
+    paginator = CursorPaginator(rows, settings.POSTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get(CURSOR_PARAM))
+    return JsonResponse({
+        'results': [serialize(row, fields) for row in page],
+        'next': page_link(request, page.next_cursor()),
+        'previous': page_link(request, page.previous_cursor()),
+    })
+
+
+@condition(
+    etag_func=conditional.index_etag,
+    last_modified_func=conditional.index_last_modified,
+)
+def index(request):
+    fields = requested_fields(request)
+    if fields is None:
+        return bad_fields()
+    return feed_response(
+        request, post_rows(Post.objects.all(), fields), fields
+    )
+
+
+@condition(
+    etag_func=conditional.group_etag,
+    last_modified_func=conditional.group_last_modified,
+)
+def group_posts(request, slug):
+    fields = requested_fields(request)
+    if fields is None:
+        return bad_fields()
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, post_rows(group.posts, fields), fields)
+
+
+@condition(
+    etag_func=conditional.profile_etag,
+    last_modified_func=conditional.profile_last_modified,
+)
+def profile(request, username):
+    fields = requested_fields(request)
+    if fields is None:
+        return bad_fields()
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, post_rows(author.posts, fields), fields)
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется вход'}, status=401)
+    fields = requested_fields(request)
+    if fields is None:
+        return bad_fields()
+    rows = post_rows(Post.objects.all(), fields)
+    return feed_response(
+        request, follow_feed(request.user, posts=rows), fields
+    )
@@ -0,0 +1,118 @@
+"""Поколения кэша для лент.
+
+Каждая лента (главная, группа, автор) имеет счётчик поколения. Он входит
+в ключи кэша страниц и увеличивается при записи в данные ленты, поэтому
+кэш можно держать часами, а устаревшие записи просто перестают
+запрашиваться.
+
+Ленты групп и авторов определяются slug и username, как в адресах
+страниц: так ключ кэша страницы вычисляется без обращения к базе.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Group, User
+
+GENERATION_KEY = 'generation:{}'
+MODIFIED_KEY = 'modified:{}'
+INDEX = 'index'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scopes(post):
+    """Ленты, в которых выводится пост, включая прежнюю группу поста."""
+    scopes = [INDEX]
+    scopes += map(author_scope, (
+        User.objects.filter(pk=post.author_id)
+        .values_list('username', flat=True)
+    ))
+    group_ids = {post.group_id, getattr(post, '_saved_group_id', None)}
+    group_ids.discard(None)
+    if group_ids:
+        scopes += map(group_scope, (
+            Group.objects.filter(pk__in=group_ids)
+            .values_list('slug', flat=True)
+        ))
+    return scopes
+
+
+def page_scope(match):
+    """Лента страницы по результату resolve() или None."""
+    if match.view_name in ('posts:index', 'posts:api_index'):
+        return INDEX
+    if match.view_name in ('posts:group_list', 'posts:api_group_list'):
+        return group_scope(match.kwargs['slug'])
+    if match.view_name in ('posts:profile', 'posts:api_profile'):
+        return author_scope(match.kwargs['username'])
+    return None
+
+
+def _initial():
+    # Начальное значение зависит от времени: если счётчик вытеснен из
+    # кэша, новое поколение не совпадёт с поколениями старых записей.
+    return int(time.time() * 1000)
+
+
+def generations(*scopes):
+    """Текущие поколения лент; отсутствующие счётчики создаются."""
+    keys = {GENERATION_KEY.format(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    missing = {key: _initial() for key in keys if key not in found}
+    for key, value in missing.items():
+        if not cache.add(key, value, None):
+            value = cache.get(key, value)
+        found[key] = value
+    return {keys[key]: value for key, value in found.items()}
+
+
+def version(*scopes):
+    """Строка версии для ключа кэша, составленная из поколений лент."""
+    current = generations(*scopes)
+    return '.'.join(str(current[scope]) for scope in scopes)
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial(), None)
+    now = int(time.time())
+    cache.set_many(
+        {MODIFIED_KEY.format(scope): now for scope in scopes}, None
+    )
+
+
+def modified(*scopes):
+    """Время последней записи в ленты для заголовка Last-Modified.
+
+    Если отметка вытеснена из кэша, записью считается текущий момент:
+    клиенты один лишний раз получат страницу целиком, но не устаревшую.
+    """
+    keys = [MODIFIED_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    now = int(time.time())
+    for key in keys:
+        if key not in found:
+            cache.add(key, now, None)
+            found[key] = cache.get(key, now)
+    return datetime.fromtimestamp(max(found.values()), timezone.utc)
+
+
+def cache_context(*scopes):
+    """Переменные шаблона для тега {% cache %} страницы ленты."""
+    return {
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'cache_version': version(*scopes),
+    }
@@ -0,0 +1,61 @@
+"""Кэш готовых карточек постов (includes/content.html) в лентах.
+
+Ключ карточки — id поста, его версия и вариант шаблона: профиль не
+выводит автора, лента группы — ссылку на группу. Версия растёт при
+правке поста, переименовании автора и изменении группы (см. сигналы),
+поэтому устаревшая карточка просто перестаёт читаться. Карточки страницы
+берутся одним get_many, рендерятся только промахи, и они же сохраняются
+одним set_many.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .templatetags.post_images import post_picture
+
+CARD_KEY = 'card:{}:{}:{}'
+TEMPLATE = 'includes/content.html'
+# Переменные контекста, от которых зависит вывод карточки.
+VARIANT_NAMES = ('author', 'group')
+
+
+def variant(context):
+    return '-'.join(
+        name for name in VARIANT_NAMES if context.get(name)
+    ) or 'feed'
+
+
+def card_key(post, kind):
+    return CARD_KEY.format(post.pk, post.version, kind)
+
+
+def render(context, post):
+    template = context.template.engine.get_template(TEMPLATE)
+    with context.push(post=post):
+        return template.render(context)
+
+
+def cacheable(context, post):
+    # Пока миниатюры не готовы, в карточке заглушка: её не запоминаем.
+    return not post.image or post_picture(context, post.image) is not None
+
+
+def page_cards(context, posts):
+    """Пары (пост, HTML карточки) для posts в контексте страницы."""
+    posts = list(posts)
+    kind = variant(context)
+    keys = {post.pk: card_key(post, kind) for post in posts}
+    found = cache.get_many(list(keys.values()))
+    missed = {}
+    cards = []
+    for post in posts:
+        key = keys[post.pk]
+        html = found.get(key)
+        if html is None:
+            html = render(context, post)
+            if cacheable(context, post):
+                missed[key] = html
+        cards.append((post, mark_safe(html)))
+    if missed:
+        cache.set_many(missed, settings.CARD_CACHE_TIMEOUT)
+    return cards
@@ -0,0 +1,116 @@
+"""Валидаторы условных GET-запросов (ETag и Last-Modified).
+
+Функции передаются в декоратор condition() и вычисляются до view: если
+клиент прислал совпадающие If-None-Match или If-Modified-Since, ответ 304
+отдаётся без запросов страницы и рендеринга шаблонов.
+
+ETag лент строится из поколений кэша (см. caching), поэтому учитывает
+и правки, и удаления постов. Last-Modified лент берётся из отметок
+времени тех же поколений, у страницы поста — из даты изменения поста
+и даты последнего комментария.
+
+Вошедшему пользователю страница поста выводит форму комментария с
+CSRF-токеном, поэтому её ETag включает и токен, а Last-Modified, который
+токен не отражает, не отдаётся: после входа, выхода или смены токена
+ответ 304 оставил бы в браузере форму со старым.
+"""
+import hashlib
+
+from django.db.models import OuterRef, Subquery
+from django.middleware.csrf import get_token
+
+from .caching import INDEX, author_scope, group_scope, modified, version
+from .models import Comment, Post
+
+
+def _etag(request, *parts):
+    # Шапка страницы и кнопки зависят от пользователя, поэтому он
+    # тоже входит в ETag.
+    viewer = request.user.pk if request.user.is_authenticated else ''
+    raw = '|'.join(map(str, (viewer, request.get_full_path(), *parts)))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def index_etag(request):
+    return _etag(request, version(INDEX))
+
+
+def index_last_modified(request):
+    return modified(INDEX)
+
+
+def group_etag(request, slug):
+    return _etag(request, version(group_scope(slug)))
+
+
+def group_last_modified(request, slug):
+    return modified(group_scope(slug))
+
+
+def profile_etag(request, username):
+    return _etag(request, version(author_scope(username)))
+
+
+def profile_last_modified(request, username):
+    return modified(author_scope(username))
+
+
+def _post_state(request, post_id):
+    """Данные поста для валидаторов; один запрос на оба заголовка."""
+    if not hasattr(request, '_post_state'):
+        last_comment = (
+            Comment.objects.filter(post=OuterRef('pk'))
+            .order_by('-created', '-id')
+            .values('created')[:1]
+        )
+        request._post_state = (
+            Post.objects.filter(pk=post_id)
+            .annotate(last_comment=Subquery(last_comment))
+            .values(
+                'updated',
+                'comments_count',
+                'last_comment',
+                'author__username',
+            )
+            .first()
+        )
+    return request._post_state
+
+
+def _form_token(request):
+    """CSRF-токен формы комментария на странице поста или ''."""
+    if not request.user.is_authenticated:
+        return ''
+    # get_token() создаёт токен, если куки ещё нет: страница выведет тот же.
+    get_token(request)
+    return request.META['CSRF_COOKIE']
+
+
+def post_etag(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    return _etag(
+        request,
+        _form_token(request),
+        state['updated'].isoformat(),
+        state['comments_count'],
+        state['last_comment'] and state['last_comment'].isoformat(),
+        version(author_scope(state['author__username'])),
+    )
+
+
+def post_last_modified(request, post_id):
+    if request.user.is_authenticated:
+        return None
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    # Имя и число постов автора выводятся на странице поста.
+    dates = [
+        state['updated'],
+        modified(author_scope(state['author__username'])),
+    ]
+    if state['last_comment'] is not None:
+        dates.append(state['last_comment'])
+    return max(dates)
@@ -0,0 +1,313 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются F-выражениями при создании и удалении Post, Comment и
+Follow, поэтому страницы не выполняют COUNT(*). Так же считаются ссылки
+постов на файлы картинок (ImageBlob). Расхождения находит и исправляет
+команда check_counters.
+"""
+import logging
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from sorl.thumbnail import delete as delete_with_thumbnails
+
+from . import thumbnails
+from .models import Comment, Follow, Group, ImageBlob, Post, User, UserStats
+
+logger = logging.getLogger(__name__)
+
+# Сколько id передаётся в один запрос IN (...) при пересчёте.
+RECOUNT_BATCH = 500
+
+
+def _bump(queryset, field, delta):
+    if delta < 0:
+        # Счётчик мог разойтись с данными; уходить ниже нуля ему нельзя.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    updated = _bump(UserStats.objects.filter(user_id=user_id), field, delta)
+    if not updated and delta > 0:
+        # Строки ещё нет (например, пользователь создан bulk_create):
+        # считаем все счётчики заново, новая запись уже учтена.
+        recount_user(user_id)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _bump(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def bump_post(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def bump_image(name, delta):
+    """Меняет число постов, ссылающихся на файл картинки name.
+
+    Файл, на который не осталось ссылок, удаляется вместе с миниатюрами
+    после фиксации транзакции.
+    """
+    if not name:
+        return
+    blobs = ImageBlob.objects.filter(name=name)
+    updated = _bump(blobs, 'refs', delta)
+    if not updated and delta > 0:
+        recount_image(name)
+    elif delta < 0 and blobs.filter(refs=0).delete()[0]:
+        transaction.on_commit(lambda: _delete_image(name))
+
+
+def _delete_image(name):
+    # Пока транзакция фиксировалась, на файл мог сослаться новый пост.
+    if ImageBlob.objects.filter(name=name).exists():
+        return
+    if Post.objects.filter(image=name).exists():
+        return
+    try:
+        delete_with_thumbnails(thumbnails.source(name))
+    except (OSError, SuspiciousFileOperation):
+        # Запрос, удаливший пост, уже выполнен; оставшийся файл не мешает.
+        logger.exception('Не удалось удалить картинку %s', name)
+
+
+def recount_image(name):
+    refs = Post.objects.filter(image=name).count()
+    if not refs:
+        ImageBlob.objects.filter(name=name).delete()
+        return
+    ImageBlob.objects.update_or_create(name=name, defaults={'refs': refs})
+
+
+def count_of(model, field):
+    """Подзапрос COUNT(*) строк model, ссылающихся на внешнюю строку."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def actual_user_counts():
+    return User.objects.annotate(
+        actual_posts=count_of(Post, 'author'),
+        actual_followers=count_of(Follow, 'author'),
+        actual_following=count_of(Follow, 'user'),
+    )
+
+
+def recount_user(user_id):
+    counts = actual_user_counts().filter(pk=user_id).values(
+        'actual_posts', 'actual_followers', 'actual_following'
+    ).first()
+    if counts is None:
+        return None
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': counts['actual_posts'],
+            'followers_count': counts['actual_followers'],
+            'following_count': counts['actual_following'],
+        },
+    )
+    return stats
+
+
+def stats_for(user):
+    """Счётчики пользователя; отсутствующая строка создаётся пересчётом."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        user.stats = recount_user(user.pk)
+        return user.stats
+
+
+def find_drift():
+    """Перечисляет расхождения счётчиков с реальными данными.
+
+    Возвращает кортежи (модель, pk, поле, сохранённое, реальное);
+    для пользователя без строки счётчиков сохранённое значение — None.
+    """
+    posts = Post.objects.annotate(
+        actual=count_of(Comment, 'post')
+    ).exclude(comments_count=F('actual'))
+    for pk, stored, actual in posts.values_list(
+        'pk', 'comments_count', 'actual'
+    ).iterator():
+        yield 'post', pk, 'comments_count', stored, actual
+
+    groups = Group.objects.annotate(
+        actual=count_of(Post, 'group')
+    ).exclude(posts_count=F('actual'))
+    for pk, stored, actual in groups.values_list(
+        'pk', 'posts_count', 'actual'
+    ).iterator():
+        yield 'group', pk, 'posts_count', stored, actual
+
+    yield from _image_drift()
+
+    users = actual_user_counts().values_list(
+        'pk',
+        'stats__posts_count', 'actual_posts',
+        'stats__followers_count', 'actual_followers',
+        'stats__following_count', 'actual_following',
+    )
+    for pk, *pairs in users.iterator():
+        fields = ('posts_count', 'followers_count', 'following_count')
+        for field, stored, actual in zip(fields, pairs[::2], pairs[1::2]):
+            if stored != actual:
+                yield 'user', pk, field, stored, actual
+
+
+def _image_drift():
+    blobs = ImageBlob.objects.annotate(
+        actual=count_of(Post, 'image')
+    ).exclude(refs=F('actual'))
+    for name, stored, actual in blobs.values_list(
+        'name', 'refs', 'actual'
+    ).iterator():
+        yield 'image', name, 'refs', stored, actual
+
+    missing = (
+        Post.objects.exclude(image='')
+        .exclude(image__in=ImageBlob.objects.values('name'))
+        .order_by()
+        .values_list('image')
+        .annotate(actual=Count('pk'))
+    )
+    for name, actual in missing.iterator():
+        yield 'image', name, 'refs', None, actual
+
+
+def repair(drift):
+    """Исправляет найденные find_drift() расхождения."""
+    users = set()
+    for model, pk, field, stored, actual in drift:
+        if model == 'post':
+            Post.objects.filter(pk=pk).update(**{field: actual})
+        elif model == 'group':
+            Group.objects.filter(pk=pk).update(**{field: actual})
+        elif model == 'image':
+            recount_image(pk)
+        else:
+            users.add(pk)
+    for pk in users:
+        recount_user(pk)
+
+
+def _scoped(queryset, field, values):
+    """queryset целиком (values is None) или по частям values.
+
+    Части нужны потому, что число параметров запроса у SQLite ограничено.
+    """
+    if values is None:
+        yield queryset
+        return
+    values = list(values)
+    for start in range(0, len(values), RECOUNT_BATCH):
+        chunk = values[start:start + RECOUNT_BATCH]
+        yield queryset.filter(**{f'{field}__in': chunk})
+
+
+def recount_posts(post_ids=None):
+    for posts in _scoped(Post.objects.all(), 'pk', post_ids):
+        posts.update(comments_count=count_of(Comment, 'post'))
+
+
+def recount_groups(group_ids=None):
+    for groups in _scoped(Group.objects.all(), 'pk', group_ids):
+        groups.update(posts_count=count_of(Post, 'group'))
+
+
+def recount_users(user_ids=None):
+    """Пересчитывает счётчики user_ids; недостающие строки создаются."""
+    if user_ids is not None:
+        user_ids = list(user_ids)
+    for stats in _scoped(UserStats.objects.all(), 'user_id', user_ids):
+        stats.update(
+            posts_count=count_of(Post, 'author'),
+            followers_count=count_of(Follow, 'author'),
+            following_count=count_of(Follow, 'user'),
+        )
+    users = actual_user_counts().exclude(
+        pk__in=UserStats.objects.values('user_id')
+    )
+    for missing in _scoped(users, 'pk', user_ids):
+        UserStats.objects.bulk_create(
+            (
+                UserStats(
+                    user_id=pk,
+                    posts_count=posts_count,
+                    followers_count=followers_count,
+                    following_count=following_count,
+                )
+                for pk, posts_count, followers_count, following_count in (
+                    missing.values_list(
+                        'pk',
+                        'actual_posts',
+                        'actual_followers',
+                        'actual_following',
+                    ).iterator()
+                )
+            ),
+            ignore_conflicts=True,
+        )
+
+
+def recount_images(names=None):
+    """Пересчитывает ссылки на файлы names.
+
+    Записи без ссылок удаляются, сами файлы остаются на месте.
+    """
+    if names is not None:
+        names = list(names)
+    for blobs in _scoped(ImageBlob.objects.all(), 'name', names):
+        blobs.update(refs=count_of(Post, 'image'))
+        blobs.filter(refs=0).delete()
+    posts = (
+        Post.objects.exclude(image='')
+        .exclude(image__in=ImageBlob.objects.values('name'))
+    )
+    for missing in _scoped(posts, 'image', names):
+        ImageBlob.objects.bulk_create(
+            (
+                ImageBlob(name=name, refs=refs)
+                for name, refs in (
+                    missing.order_by()
+                    .values_list('image')
+                    .annotate(refs=Count('pk'))
+                    .iterator()
+                )
+            ),
+            ignore_conflicts=True,
+        )
+
+
+@transaction.atomic
+def recount(user_ids=None, group_ids=None, post_ids=None, image_names=None):
+    """Пересчитывает счётчики в одной транзакции несколькими запросами.
+
+    Для данных, загруженных bulk_create мимо сигналов: построчный
+    repair() на сотнях тысяч строк слишком медленный. Без аргумента
+    пересчитываются все строки модели, иначе только перечисленные.
+    Строки меняются на месте, поэтому параллельные запросы не видят
+    обнулённых счётчиков.
+    """
+    recount_posts(post_ids)
+    recount_groups(group_ids)
+    recount_images(image_names)
+    recount_users(user_ids)
+
+
+def recount_all():
+    recount()
@@ -0,0 +1,175 @@
+"""Потоковая выгрузка постов и комментариев автора.
+
+Записи читаются через iterator(chunk_size=...) и сразу превращаются
+в строки JSONL или CSV, поэтому память не зависит от того, сколько
+автор успел написать. Архив zip с картинками тоже пишется потоком:
+zipfile умеет писать в поток без перемотки, а сжатые данные отдаются
+по мере заполнения буфера.
+"""
+import csv
+import json
+import zipfile
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Post
+
+FORMATS = ('jsonl', 'csv')
+COLUMNS = (
+    'type', 'id', 'author', 'created', 'text', 'group', 'image', 'post',
+    'post_author',
+)
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'zip': 'application/zip',
+}
+
+
+def content_disposition(filename):
+    """Заголовок Content-Disposition для скачивания файла filename.
+
+    Имя пользователя может быть не ASCII: полное имя передаётся в
+    filename* (RFC 6266), а в filename — его ASCII-часть для старых
+    клиентов.
+    """
+    name, _, extension = filename.rpartition('.')
+    fallback = name.encode('ascii', 'ignore').decode() or 'posts'
+    return (
+        f'attachment; filename="{fallback}.{extension}"; '
+        f"filename*=UTF-8''{quote(filename)}"
+    )
+
+
+def records(author):
+    """Посты, затем комментарии автора в виде словарей COLUMNS."""
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    posts = (
+        Post.objects.filter(author=author)
+        .select_related('group')
+        .order_by('pub_date', 'id')
+    )
+    for post in posts.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'post',
+            'id': post.id,
+            'author': author.username,
+            'created': post.pub_date,
+            'text': post.text,
+            'group': post.group.slug if post.group else None,
+            'image': post.image.name or None,
+            'post': None,
+            'post_author': None,
+        }
+    comments = (
+        Comment.objects.filter(author=author)
+        .select_related('post__author')
+        .order_by('created', 'id')
+    )
+    for comment in comments.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'comment',
+            'id': comment.id,
+            'author': author.username,
+            'created': comment.created,
+            'text': comment.text,
+            'group': None,
+            'image': None,
+            'post': comment.post_id,
+            'post_author': comment.post.author.username,
+        }
+
+
+def jsonl(author):
+    for record in records(author):
+        line = json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+        yield f'{line}\n'.encode()
+
+
+class _Line:
+    """Файл для csv.writer, который возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(author):
+    writer = csv.writer(_Line())
+    yield writer.writerow(COLUMNS).encode()
+    for record in records(author):
+        yield writer.writerow([
+            '' if record[column] is None else record[column]
+            for column in COLUMNS
+        ]).encode()
+
+
+def stream(author, export_format):
+    """Выгрузка в формате export_format ('jsonl' или 'csv') по кускам."""
+    if export_format == 'csv':
+        return csv_rows(author)
+    return jsonl(author)
+
+
+def image_names(author):
+    """Разные картинки постов автора без множества в памяти."""
+    return (
+        Post.objects.filter(author=author)
+        .exclude(image='')
+        .order_by('image')
+        .values_list('image', flat=True)
+        .distinct()
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+class _Buffer:
+    """Поток без перемотки, из которого забираются записанные байты."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def zip_stream(author, export_format):
+    """Архив с выгрузкой posts.<формат> и картинками под их именами."""
+    buffer = _Buffer()
+    storage = Post._meta.get_field('image').storage
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        name = f'posts.{export_format}'
+        with archive.open(name, 'w', force_zip64=True) as entry:
+            for chunk in stream(author, export_format):
+                entry.write(chunk)
+                yield buffer.drain()
+        for image in image_names(author):
+            try:
+                source = storage.open(image)
+            except (OSError, SuspiciousFileOperation):
+                # Файл удалён или лежит вне хранилища: в выгрузке
+                # остаётся только его имя.
+                continue
+            # Картинки уже сжаты, второй раз их не сжимаем.
+            info = zipfile.ZipInfo(image)
+            with source, archive.open(info, 'w', force_zip64=True) as entry:
+                for chunk in source.chunks():
+                    entry.write(chunk)
+                    yield buffer.drain()
+    yield buffer.drain()
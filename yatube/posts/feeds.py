@@ -0,0 +1,166 @@
+"""RSS и Atom для главной ленты, групп и авторов.
+
+Читалки опрашивают ленты каждые несколько минут, поэтому готовый XML
+хранится в кэше под ключом с поколением ленты (см. caching): новый,
+изменённый или удалённый пост меняет поколение, и лента собирается
+заново из FEED_POSTS последних постов, прочитанных по индексу
+(-pub_date, -id). Last-Modified — дата самого нового поста, ETag —
+хэш XML; на совпадающий условный запрос отвечает 304 без обращения
+к базе. Ссылки в XML абсолютные, поэтому в ключ входят и схема с хостом
+запроса.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import linebreaksbr
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import escape
+from django.utils.http import parse_http_date_safe
+from django.utils.text import Truncator
+
+from .caching import INDEX, author_scope, group_scope, version
+from .models import Group, Post, User
+
+FEED_KEY = 'feed:{}:{}'
+TITLE_WORDS = 10
+LATEST = ('-pub_date', '-id')
+
+
+class PostFeed(Feed):
+    def item_title(self, post):
+        return Truncator(post.text).words(TITLE_WORDS)
+
+    def item_description(self, post):
+        # Читалки выводят описание как HTML: текст экранируется, как
+        # в шаблонах страниц.
+        return linebreaksbr(escape(post.text))
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=(post.id,))
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self._get_dynamic_attr('description', obj)
+
+
+class IndexFeed(PostFeed):
+    title = 'Yatube: последние записи'
+    description = 'Новые посты всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return (
+            Post.objects.select_related('author')
+            .order_by(*LATEST)[:settings.FEED_POSTS]
+        )
+
+
+class GroupFeed(PostFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=(group.slug,))
+
+    def items(self, group):
+        return (
+            group.posts.select_related('author')
+            .order_by(*LATEST)[:settings.FEED_POSTS]
+        )
+
+
+class ProfileFeed(PostFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Посты пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def items(self, author):
+        return (
+            author.posts.select_related('author')
+            .order_by(*LATEST)[:settings.FEED_POSTS]
+        )
+
+
+class IndexAtomFeed(AtomMixin, IndexFeed):
+    pass
+
+
+class GroupAtomFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class ProfileAtomFeed(AtomMixin, ProfileFeed):
+    pass
+
+
+def cached(feed, scope_for):
+    """View ленты feed, собранной один раз на поколение ленты scope_for."""
+
+    def view(request, **kwargs):
+        address = f'{request.scheme}://{request.get_host()}{request.path}'
+        key = FEED_KEY.format(
+            hashlib.md5(address.encode()).hexdigest(),
+            version(scope_for(**kwargs)),
+        )
+        entry = cache.get(key)
+        if entry is None:
+            built = feed(request, **kwargs)
+            entry = (
+                built['Content-Type'],
+                built.content,
+                built['Last-Modified'],
+                quote_etag(hashlib.md5(built.content).hexdigest()),
+            )
+            cache.set(key, entry, settings.FEED_CACHE_TIMEOUT)
+        content_type, content, last_modified, etag = entry
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=parse_http_date_safe(last_modified),
+        )
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        response['Last-Modified'] = last_modified
+        response['ETag'] = etag
+        return response
+
+    return view
+
+
+index_rss = cached(IndexFeed(), lambda: INDEX)
+index_atom = cached(IndexAtomFeed(), lambda: INDEX)
+group_rss = cached(GroupFeed(), group_scope)
+group_atom = cached(GroupAtomFeed(), group_scope)
+profile_rss = cached(ProfileFeed(), author_scope)
+profile_atom = cached(ProfileAtomFeed(), author_scope)
@@ -0,0 +1,118 @@
+"""Множество авторов, на которых подписан пользователь.
+
+Хранится в кэше как отсортированный array('q') id авторов: восемь байт на
+подписку вместо объекта int в set, и проверка «подписан ли» — бинарный
+поиск. Читается из Follow при промахе кэша; подписка и отписка
+удаляют ключ после фиксации транзакции (см. сигналы Follow), и
+следующее обращение перечитывает множество. Правка на месте до фиксации
+оставила бы в кэше неверное множество при откате или одновременной
+подписке из другого запроса.
+
+В пределах запроса множество запоминается на объекте пользователя,
+поэтому профиль, лента и кнопки подписки обращаются к кэшу один раз.
+"""
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+FOLLOWING_KEY = 'following:{}'
+TYPECODE = 'q'
+
+
+class FollowedAuthors:
+    """Отсортированные id авторов с проверкой вхождения за O(log n)."""
+
+    def __init__(self, author_ids=()):
+        self.ids = array(TYPECODE, sorted(set(author_ids)))
+
+    def __repr__(self):
+        return f'<FollowedAuthors {len(self)}>'
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def _index(self, author_id):
+        index = bisect_left(self.ids, author_id)
+        if index < len(self.ids) and self.ids[index] == author_id:
+            return index
+        return None
+
+    def __contains__(self, author_id):
+        return self._index(author_id) is not None
+
+    def following(self, author_ids):
+        """Те из author_ids, на кого пользователь подписан."""
+        return {
+            author_id for author_id in author_ids
+            if author_id is not None and author_id in self
+        }
+
+    def add(self, author_id):
+        if author_id not in self:
+            insort(self.ids, author_id)
+
+    def discard(self, author_id):
+        index = self._index(author_id)
+        if index is not None:
+            del self.ids[index]
+
+
+def _load(user_id):
+    return FollowedAuthors(
+        Follow.objects.filter(user_id=user_id)
+        .order_by('author_id')
+        .values_list('author_id', flat=True)
+    )
+
+
+def _store(user_id, followed):
+    # В кэше лежат байты массива: они компактнее pickle объекта.
+    cache.set(
+        FOLLOWING_KEY.format(user_id),
+        followed.ids.tobytes(),
+        settings.FOLLOWING_TIMEOUT,
+    )
+
+
+def _fetch(user_id):
+    raw = cache.get(FOLLOWING_KEY.format(user_id))
+    if raw is None:
+        followed = _load(user_id)
+        _store(user_id, followed)
+        return followed
+    followed = FollowedAuthors()
+    followed.ids.frombytes(raw)
+    return followed
+
+
+def followed_authors(user):
+    """Авторы, на которых подписан user; для анонима — пустое множество."""
+    if not user.is_authenticated:
+        return FollowedAuthors()
+    if not hasattr(user, '_followed_authors'):
+        user._followed_authors = _fetch(user.pk)
+    return user._followed_authors
+
+
+def is_following(user, author_id):
+    return author_id in followed_authors(user)
+
+
+def forget(user_id):
+    """Сбрасывает множество user_id после фиксации транзакции."""
+    key = FOLLOWING_KEY.format(user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate(user_ids):
+    """Сбрасывает множества пользователей, чьи подписки менялись мимо
+    сигналов (bulk_create, загрузка данных)."""
+    cache.delete_many([FOLLOWING_KEY.format(user_id) for user_id in user_ids])
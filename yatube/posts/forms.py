@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import uploads
 from .models import Post, Comment
 
 
@@ -9,6 +11,17 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image',)
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        post = self.instance
+        if isinstance(image, UploadedFile):
+            image = uploads.normalize(image)
+            post.image_width, post.image_height = image.width, image.height
+            post.image_bytes = image.size
+        elif not image:
+            post.image_width = post.image_height = post.image_bytes = None
+        return image
+
 
 class CommentForm(forms.ModelForm):
 
@@ -0,0 +1,309 @@
+"""Пакетный импорт постов и комментариев из JSONL.
+
+Формат строк — тот же, что у выгрузки posts.export:
+
+    {"type": "post", "id": 17, "author": "leo", "created": "2020-01-01T…",
+     "text": "…", "group": "cats", "image": "posts/…"}
+    {"type": "comment", "author": "anna", "post": 17, "created": "…",
+     "text": "…"}
+
+id поста — id в источнике; комментарий ссылается на него и должен идти
+после поста. Id в базе назначает сама база. Файл читается построчно,
+авторы и группы ищутся через словари в памяти (база спрашивается один
+раз на пачку о новых именах), строки пачки вставляются bulk_create в
+одной транзакции. Даты берутся из источника, auto_now_add на время
+импорта отключается.
+
+bulk_create идёт мимо сигналов, поэтому счётчики затронутых строк,
+ленты подписок и кэш лент обновляются один раз в конце (finish()).
+Поисковый индекс обновляют триггеры базы.
+"""
+import contextlib
+import json
+from collections import Counter
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, counters, timeline
+from .models import Comment, Group, Post, User
+from .seed import batched
+
+
+# Сколько значений передаётся в один запрос IN (...): у SQLite число
+# параметров запроса ограничено.
+LOOKUP_BATCH = 500
+
+
+class SkipRecord(Exception):
+    """Строка пропускается; аргумент — причина для отчёта."""
+
+
+@contextlib.contextmanager
+def source_timestamps():
+    """Отключает auto_now и auto_now_add, чтобы сохранить даты источника.
+
+    Меняет поля моделей на уровне процесса, поэтому годится только для
+    команды импорта, а не для запросов.
+    """
+    fields = [
+        (Post._meta.get_field('pub_date'), 'auto_now_add'),
+        (Post._meta.get_field('updated'), 'auto_now'),
+        (Comment._meta.get_field('created'), 'auto_now_add'),
+    ]
+    saved = [(field, attr, getattr(field, attr)) for field, attr in fields]
+    for field, attr in fields:
+        setattr(field, attr, False)
+    try:
+        yield
+    finally:
+        for field, attr, value in saved:
+            setattr(field, attr, value)
+
+
+def parse_moment(value):
+    moment = parse_datetime(value) if isinstance(value, str) else None
+    if moment is None:
+        raise SkipRecord('bad_date')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def bulk_create(model, objects):
+    if not objects:
+        return
+    # Пачка не больше, чем допускает база: у SQLite ограничено число
+    # параметров в одном запросе.
+    size = connection.ops.bulk_batch_size(model._meta.concrete_fields, objects)
+    model.objects.bulk_create(objects, batch_size=max(size, 1))
+
+
+def create_posts(posts):
+    """bulk_create постов с id, назначенными базой.
+
+    Вызывается внутри transaction.atomic(). Базы, которые не возвращают
+    id из bulk_create (SQLite), держат блокировку записи до конца
+    транзакции, поэтому вставленные посты получили последние id подряд
+    в порядке вставки.
+    """
+    bulk_create(Post, posts)
+    if not posts or posts[0].pk is not None:
+        return
+    ids = (
+        Post.objects.order_by('-id')
+        .values_list('id', flat=True)[:len(posts)]
+    )
+    for post, pk in zip(posts, reversed(list(ids))):
+        post.pk = pk
+
+
+class Importer:
+    """Импортирует строки JSONL пачками по batch_size записей.
+
+    create_missing создаёт отсутствующих авторов (без пароля) и группы,
+    иначе их записи пропускаются. progress, если задан, вызывается после
+    каждой пачки: progress(imported, skipped).
+    """
+
+    def __init__(self, batch_size=1000, create_missing=False, progress=None):
+        self.batch_size = batch_size
+        self.create_missing = create_missing
+        self.progress = progress
+        self.authors = {}
+        self.groups = {}
+        # id поста в источнике -> id в базе.
+        self.posts = {}
+        # Посты текущей пачки до вставки: id в источнике -> Post.
+        self.batch_posts = {}
+        self.imported = Counter()
+        self.skipped = Counter()
+        self.touched_authors = set()
+        self.touched_users = set()
+        self.touched_groups = set()
+        self.touched_posts = set()
+        self.touched_images = set()
+        # id вставленных постов: их раскладывает по лентам finish().
+        self.created_posts = []
+
+    def records(self, lines):
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                self.skipped['bad_json'] += 1
+                continue
+            if not isinstance(record, dict) or record.get('type') not in (
+                'post', 'comment'
+            ):
+                self.skipped['bad_type'] += 1
+                continue
+            yield record
+
+    def _resolve(self, model, field, cache, names, defaults):
+        missing = {name for name in names if name and name not in cache}
+        if not missing:
+            return
+        found = dict(
+            model.objects.filter(**{f'{field}__in': missing})
+            .values_list(field, 'id')
+        )
+        new = missing - set(found)
+        if new and self.create_missing:
+            bulk_create(model, [
+                model(**{field: name}, **defaults(name)) for name in new
+            ])
+            found.update(
+                model.objects.filter(**{f'{field}__in': new})
+                .values_list(field, 'id')
+            )
+        cache.update(found)
+
+    def resolve(self, batch):
+        self._resolve(
+            User, 'username', self.authors,
+            {record.get('author') for record in batch},
+            lambda name: {'password': '!'},
+        )
+        self._resolve(
+            Group, 'slug', self.groups,
+            {record.get('group') for record in batch},
+            lambda slug: {'title': slug, 'description': ''},
+        )
+
+    def author_id(self, record):
+        author_id = self.authors.get(record.get('author'))
+        if author_id is None:
+            raise SkipRecord('unknown_author')
+        return author_id
+
+    def post(self, record):
+        source_id = record.get('id')
+        if source_id is not None and (
+            source_id in self.posts or source_id in self.batch_posts
+        ):
+            raise SkipRecord('duplicate_post')
+        author_id = self.author_id(record)
+        group_id = None
+        if record.get('group'):
+            group_id = self.groups.get(record['group'])
+            if group_id is None:
+                raise SkipRecord('unknown_group')
+        created = parse_moment(record.get('created'))
+        return Post(
+            text=record.get('text') or '',
+            pub_date=created,
+            updated=created,
+            author_id=author_id,
+            group_id=group_id,
+            image=record.get('image') or '',
+            image_width=record.get('image_width'),
+            image_height=record.get('image_height'),
+            image_bytes=record.get('image_bytes'),
+        )
+
+    def comment(self, record):
+        """Комментарий и пост текущей пачки, к которому он относится.
+
+        Если пост уже в базе, вместо него возвращается None.
+        """
+        source_id = record.get('post')
+        post = self.batch_posts.get(source_id)
+        post_id = self.posts.get(source_id)
+        if post is None and post_id is None:
+            raise SkipRecord('unknown_post')
+        comment = Comment(
+            text=record.get('text') or '',
+            created=parse_moment(record.get('created')),
+            post_id=post_id,
+            author_id=self.author_id(record),
+        )
+        return comment, post
+
+    def read_batch(self, batch):
+        """Посты и пары (комментарий, пост пачки) из записей batch."""
+        self.batch_posts = {}
+        posts, comments = [], []
+        for record in batch:
+            try:
+                if record['type'] == 'post':
+                    post = self.post(record)
+                    if record.get('id') is not None:
+                        self.batch_posts[record['id']] = post
+                    posts.append(post)
+                else:
+                    comments.append(self.comment(record))
+            except SkipRecord as skip:
+                self.skipped[skip.args[0]] += 1
+        return posts, comments
+
+    def touch(self, posts, comments):
+        """Запоминает строки, счётчики которых пересчитает finish()."""
+        for post in posts:
+            self.created_posts.append(post.pk)
+            self.touched_authors.add(post.author_id)
+            self.touched_posts.add(post.pk)
+            if post.group_id is not None:
+                self.touched_groups.add(post.group_id)
+            if post.image:
+                self.touched_images.add(post.image.name)
+        for comment in comments:
+            self.touched_users.add(comment.author_id)
+            self.touched_posts.add(comment.post_id)
+
+    def import_batch(self, batch):
+        self.resolve(batch)
+        posts, comments = self.read_batch(batch)
+        # Комментариям нужны id постов пачки, поэтому посты вставляются
+        # первыми.
+        create_posts(posts)
+        for source_id, post in self.batch_posts.items():
+            self.posts[source_id] = post.pk
+        for comment, post in comments:
+            if post is not None:
+                comment.post_id = post.pk
+        comments = [comment for comment, _ in comments]
+        bulk_create(Comment, comments)
+        self.touch(posts, comments)
+        self.imported['posts'] += len(posts)
+        self.imported['comments'] += len(comments)
+
+    def run(self, lines):
+        with source_timestamps():
+            for batch in batched(self.records(lines), self.batch_size):
+                with transaction.atomic():
+                    self.import_batch(batch)
+                if self.progress:
+                    self.progress(self.imported, self.skipped)
+        self.finish()
+
+    def finish(self):
+        """Пересчитывает счётчики, ленты подписок и кэш после загрузки."""
+        counters.recount(
+            user_ids=self.touched_authors | self.touched_users,
+            group_ids=self.touched_groups,
+            post_ids=self.touched_posts,
+            image_names=self.touched_images,
+        )
+        for post_ids in batched(self.created_posts, LOOKUP_BATCH):
+            timeline.distribute_posts(post_ids)
+        usernames, slugs = [], []
+        for authors in batched(self.touched_authors, LOOKUP_BATCH):
+            usernames += User.objects.filter(pk__in=authors).values_list(
+                'username', flat=True
+            )
+            for author_id in authors:
+                timeline.forget_recent(author_id)
+        for groups in batched(self.touched_groups, LOOKUP_BATCH):
+            slugs += Group.objects.filter(pk__in=groups).values_list(
+                'slug', flat=True
+            )
+        if usernames:
+            caching.bump(
+                caching.INDEX,
+                *map(caching.author_scope, usernames),
+                *map(caching.group_scope, slugs),
+            )
@@ -0,0 +1,128 @@
+"""Хранилище ключей sorl-thumbnail для картинок постов.
+
+Поверх стандартного cached_db-хранилища (кэш CACHES, за ним таблица
+thumbnail_kvstore) добавлены:
+
+* get_many() — метаданные миниатюр всей страницы одним get_many() из кэша
+  и одним запросом к таблице для промахов;
+* L1 — словарь в памяти процесса с последними найденными записями
+  картинок (identity image).
+
+Запись картинки под ключом миниатюры после создания не меняется (ключ —
+хэш имени оригинала и параметров), поэтому в L1 попадают только найденные
+записи: отсутствие миниатюры не запоминается, иначе готовая миниатюра из
+фонового потока не была бы видна до вытеснения. Удалить запись может
+другой процесс, поэтому L1 хранит её не дольше THUMBNAIL_L1_TIMEOUT.
+Списки миниатюр оригинала (identity thumbnails) меняются при каждой новой
+миниатюре и в L1 не попадают: устаревший список терял бы ключи, и их
+файлы не удалялись бы вместе с оригиналом.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    def __init__(self):
+        super().__init__()
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, value):
+        if value is None or value == EMPTY_VALUE:
+            return
+        if key.split('||')[-2] != 'image':
+            return
+        expires = time.monotonic() + settings.THUMBNAIL_L1_TIMEOUT
+        with self._lock:
+            self._memo[key] = (expires, value)
+            self._memo.move_to_end(key)
+            while len(self._memo) > settings.THUMBNAIL_L1_SIZE:
+                self._memo.popitem(last=False)
+
+    def _recall(self, key):
+        with self._lock:
+            expires, value = self._memo.get(key, (None, None))
+            if expires is not None and expires <= time.monotonic():
+                del self._memo[key]
+                return None
+            return value
+
+    def clear_memo(self):
+        """Очищает L1; кэш и таблица не меняются."""
+        with self._lock:
+            self._memo.clear()
+
+    def _forget(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._memo.pop(key, None)
+
+    def _get_raw(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = super()._get_raw(key)
+            self._remember(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._remember(key, value)
+
+    def _delete_raw(self, *keys):
+        self._forget(*keys)
+        super()._delete_raw(*keys)
+
+    def clear(self, delete_thumbnails=False):
+        self.clear_memo()
+        super().clear(delete_thumbnails)
+
+    def _get_many_raw(self, keys):
+        values = {}
+        missing = []
+        for key in keys:
+            value = self._recall(key)
+            if value is None:
+                missing.append(key)
+            else:
+                values[key] = value
+        if not missing:
+            return values
+        cached = self.cache.get_many(missing)
+        missing = [key for key in missing if key not in cached]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            # Как и _get_raw(), запоминаем в кэше и отсутствие записи.
+            found = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(found, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            cached.update(found)
+        for key, value in cached.items():
+            if value != EMPTY_VALUE:
+                self._remember(key, value)
+                values[key] = value
+        return values
+
+    def get_many(self, image_files):
+        """Словарь {ключ файла: ImageFile или None} для image_files."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self._get_many_raw(list(keys))
+        return {
+            key: (
+                deserialize_image_file(values[raw_key])
+                if values.get(raw_key) else None
+            )
+            for raw_key, key in keys.items()
+        }
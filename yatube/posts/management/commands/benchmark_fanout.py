@@ -0,0 +1,124 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, Post, User
+
+
+def measure(func, repeat):
+    """Медиана времени выполнения func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет цену раскладки поста по лентам и чтения ленты с '
+        'подмешиванием в зависимости от числа подписчиков автора. '
+        'Помогает подобрать FANOUT_FOLLOWER_THRESHOLD. Все данные '
+        'создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers',
+            nargs='+',
+            type=int,
+            default=[100, 500, 1000, 2000, 10000],
+            help='Числа подписчиков автора, для которых делаются замеры',
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--write-budget',
+            type=float,
+            default=50.0,
+            help='Допустимое время раскладки одного поста, мс',
+        )
+        parser.add_argument(
+            '--json',
+            dest='json_path',
+            help='Сохранить результаты в JSON-файл',
+        )
+
+    def run_case(self, followers, repeat):
+        with transaction.atomic():
+            author = User.objects.create_user(username=f'bench_{followers}')
+            # Посты создаются до подписок, чтобы сигнал их не раскладывал.
+            posts = [
+                Post.objects.create(author=author, text='benchmark')
+                for _ in range(repeat)
+            ]
+            User.objects.bulk_create([
+                User(username=f'bench_{followers}_{i}', password='!')
+                for i in range(followers)
+            ])
+            readers = User.objects.filter(
+                username__startswith=f'bench_{followers}_'
+            )
+            Follow.objects.bulk_create([
+                Follow(user_id=reader_id, author=author)
+                for reader_id in readers.values_list('id', flat=True)
+            ])
+            reader = readers.first()
+            write_ms = measure(
+                lambda: timeline.distribute(posts.pop()), repeat
+            )
+            per_page = settings.POSTS_PER_PAGE
+            feed = timeline.FollowFeed(reader.id, [])
+            timeline_ms = measure(lambda: feed[:per_page], repeat)
+            timeline.forget_recent(author.id)
+            timeline.recent_keys(author.id)
+            feed = timeline.FollowFeed(reader.id, [author.id])
+            hybrid_ms = measure(lambda: feed[:per_page], repeat)
+            timeline.forget_recent(author.id)
+            transaction.set_rollback(True)
+        return {
+            'followers': followers,
+            'fanout_write_ms': round(write_ms, 3),
+            'timeline_read_ms': round(timeline_ms, 3),
+            'hybrid_read_ms': round(hybrid_ms, 3),
+        }
+
+    def handle(self, *args, followers, repeat, write_budget, json_path,
+               **options):
+        results = []
+        for count in sorted(followers):
+            result = self.run_case(count, repeat)
+            results.append(result)
+            self.stdout.write(
+                '{followers:>9} подписчиков: раскладка {fanout_write_ms} мс, '
+                'чтение ленты {timeline_read_ms} мс, '
+                'чтение с подмешиванием {hybrid_read_ms} мс'.format(**result)
+            )
+        over_budget = [
+            result['followers'] for result in results
+            if result['fanout_write_ms'] > write_budget
+        ]
+        if over_budget:
+            self.stdout.write(self.style.WARNING(
+                f'Раскладка дороже {write_budget} мс начиная с '
+                f'{over_budget[0]} подписчиков; текущий порог '
+                f'FANOUT_FOLLOWER_THRESHOLD = '
+                f'{settings.FANOUT_FOLLOWER_THRESHOLD}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Раскладка укладывается в {write_budget} мс '
+                'на всех замерах'
+            ))
+        if json_path:
+            with open(json_path, 'w') as output:
+                json.dump({
+                    'threshold': settings.FANOUT_FOLLOWER_THRESHOLD,
+                    'write_budget_ms': write_budget,
+                    'results': results,
+                }, output, indent=2)
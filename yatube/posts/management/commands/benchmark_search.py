@@ -0,0 +1,122 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+from posts.seed import Seeder
+
+from .benchmark_views import percentile
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def first_page(results):
+    """То же, что делает страница поиска: число найденных и первая
+    страница."""
+    results.count()
+    list(results[:settings.POSTS_PER_PAGE])
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск по индексу FTS5 с поиском через LIKE '
+        '(icontains) на сгенерированной базе: p50/p99 времени первой '
+        'страницы результатов. Данные создаются в транзакции и '
+        'откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument(
+            '--queries', type=int, default=50,
+            help='Сколько разных слов искать',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--output', help='Сохранить результаты в JSON-файл',
+        )
+
+    def seed(self, options):
+        seeder = Seeder(
+            seed=options['seed'],
+            progress=lambda label, done, total: self.stdout.write(
+                f'\r{label}: {done}/{total}', ending=''
+            ),
+        )
+        user_ids = seeder.users(options['users'])
+        group_ids = seeder.groups(options['groups'])
+        seeder.posts(options['posts'], user_ids, group_ids)
+        self.stdout.write('')
+        return seeder
+
+    def terms(self, seeder, count):
+        words = sorted({
+            word
+            for sentence in seeder.sentences
+            for word in search.TERM.findall(sentence.lower())
+            if len(word) > 3
+        })
+        seeder.random.shuffle(words)
+        return words[:count]
+
+    def run(self, options):
+        timings = {'fts': [], 'like': []}
+        with transaction.atomic():
+            seeder = self.seed(options)
+            for term in self.terms(seeder, options['queries']):
+                timings['fts'].append(timed(
+                    lambda: first_page(search.SearchResults(term))
+                ))
+                timings['like'].append(timed(lambda: first_page(
+                    Post.objects.select_related('author', 'group')
+                    .filter(text__icontains=term)
+                    .order_by('-pub_date')
+                )))
+            transaction.set_rollback(True)
+        return {
+            key: {
+                'p50_ms': round(percentile(values, 0.5), 3),
+                'p99_ms': round(percentile(values, 0.99), 3),
+            }
+            for key, values in timings.items()
+        }
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError(
+                'Полнотекстовый индекс есть только на SQLite с FTS5; '
+                'примените миграции posts'
+            )
+        results = self.run(options)
+        for key, result in results.items():
+            self.stdout.write(
+                '{key:<5} p50 {p50_ms:>9} мс  p99 {p99_ms:>9} мс'.format(
+                    key=key, **result
+                )
+            )
+        speedup = results['like']['p50_ms'] / max(
+            results['fts']['p50_ms'], 0.001
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'FTS5 быстрее LIKE по p50 в {speedup:.1f} раза'
+        ))
+        if options['output']:
+            report = {
+                'params': {
+                    key: options[key]
+                    for key in ('posts', 'users', 'groups', 'queries', 'seed')
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
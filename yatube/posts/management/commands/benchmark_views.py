@@ -0,0 +1,263 @@
+import contextlib
+import json
+import math
+import platform
+import sqlite3
+import time
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Group, Post, UserStats
+from posts.queries import QueryLog
+from posts.seed import Seeder
+
+PAGINATED = ('index', 'group_list', 'profile', 'follow_index', 'search')
+PUBLIC = ('index', 'group_list', 'profile', 'post_detail', 'post_comments')
+# Страницы, доступные только автору поста или владельцу профиля.
+OWNER = ('post_edit', 'profile_export')
+# Номер страницы за концом ленты: Paginator отдаёт последнюю страницу,
+# то есть самый дальний OFFSET.
+LAST_PAGE = 10 ** 9
+# Разница p50 меньше этой считается шумом.
+NOISE_MS = 1.0
+# Кэш на время замера свой, чтобы не оставить в общем кэше фрагменты
+# с откаченными данными.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark_views',
+    }
+}
+
+
+@contextlib.contextmanager
+def test_environment():
+    """Окружение тестового клиента; из тестов оно уже подготовлено."""
+    try:
+        setup_test_environment(debug=False)
+    except RuntimeError:
+        yield
+        return
+    try:
+        yield
+    finally:
+        teardown_test_environment()
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер всех адресов posts/urls.py на большой базе: '
+        'p50/p99 времени ответа и число запросов. Данные создаются в '
+        'транзакции и откатываются; результат можно сравнить с базовым.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument(
+            '--follows', type=int, default=50,
+            help='Подписок на одного пользователя',
+        )
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--hot-posts', type=int, default=10,
+            help='Число постов с длинными обсуждениями',
+        )
+        parser.add_argument(
+            '--hot-comments', type=int, default=5000,
+            help='Комментариев в каждом длинном обсуждении',
+        )
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--output', help='Сохранить результаты в JSON-файл',
+        )
+        parser.add_argument(
+            '--baseline', help='JSON-файл с базовыми результатами',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост p50 относительно базового, доля',
+        )
+
+    def seed(self, options):
+        seeder = Seeder(
+            seed=options['seed'],
+            progress=lambda label, done, total: self.stdout.write(
+                f'\r{label}: {done}/{total}', ending=''
+            ),
+        )
+        user_ids = seeder.users(options['users'])
+        group_ids = seeder.groups(options['groups'])
+        post_ids = seeder.posts(options['posts'], user_ids, group_ids)
+        seeder.follows(user_ids, user_ids, options['follows'])
+        seeder.comments(
+            post_ids, user_ids, options['comments'],
+            options['hot_posts'], options['hot_comments'],
+        )
+        self.stdout.write('\rпересчёт счётчиков и лент подписок')
+        seeder.finish()
+
+    def targets(self):
+        """Адреса для замера: каждый маршрут posts/urls.py, для лент
+        также последняя страница и анонимный читатель."""
+        post = Post.objects.order_by('-comments_count').first()
+        author = post.author
+        reader = UserStats.objects.order_by('-following_count').first().user
+        values = {
+            'post_id': post.id,
+            'slug': Group.objects.order_by('-posts_count').first().slug,
+            'username': author.username,
+        }
+        # Ищем самое длинное слово поста: оно есть в тексте, но не в
+        # каждом.
+        query = max(post.text.split(), key=len)
+        for pattern in urls.urlpatterns:
+            name = pattern.name
+            kwargs = {
+                key: values[key] for key in pattern.pattern.converters
+            }
+            url = reverse(f'{urls.app_name}:{name}', kwargs=kwargs)
+            user = author if name in OWNER else reader
+            data = {'q': query} if name == 'search' else None
+            yield name, url, data, user
+            if name in PAGINATED:
+                last = {**(data or {}), 'page': LAST_PAGE}
+                yield f'{name}?page=last', url, last, user
+            if name in PUBLIC:
+                yield f'{name} (anonymous)', url, None, None
+
+    def measure(self, url, data, user, repeat, cold):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        timings, queries = [], []
+        for _ in range(repeat):
+            if cold:
+                cache.clear()
+            with QueryLog() as log:
+                started = time.perf_counter()
+                response = client.get(url, data)
+                if response.streaming:
+                    # Выгрузка строится по мере чтения ответа.
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(log.count)
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': max(queries),
+        }
+
+    def run(self, options):
+        results = {}
+        with transaction.atomic():
+            self.seed(options)
+            for key, url, data, user in self.targets():
+                results[key] = self.measure(
+                    url, data, user, options['repeat'], options['cold']
+                )
+                self.stdout.write(
+                    '{key:<32} {status} p50 {p50_ms:>9} мс  '
+                    'p99 {p99_ms:>9} мс  запросов {queries}'.format(
+                        key=key, **results[key]
+                    )
+                )
+            transaction.set_rollback(True)
+        return results
+
+    def compare(self, params, results, baseline, tolerance):
+        """Ухудшения относительно baseline и предупреждения.
+
+        Замеры на других параметрах данных несравнимы, а адрес, пропавший
+        из замера, — ухудшение: иначе сравнение молча пропускало бы его.
+        """
+        regressions, warnings = [], []
+        for key in sorted(set(params) | set(baseline['params'])):
+            if params.get(key) != baseline['params'].get(key):
+                regressions.append(
+                    f'параметр {key}: {params.get(key)}, в базовых '
+                    f'результатах {baseline["params"].get(key)}'
+                )
+        if regressions:
+            return regressions, warnings
+        for key in results.keys() - baseline['results'].keys():
+            warnings.append(f'{key}: нет в базовых результатах')
+        for key, base in baseline['results'].items():
+            current = results.get(key)
+            if current is None:
+                regressions.append(f'{key}: нет в результатах замера')
+                continue
+            if current['queries'] > base['queries']:
+                regressions.append(
+                    f'{key}: запросов {current["queries"]}, '
+                    f'было {base["queries"]}'
+                )
+            limit = max(base['p50_ms'] * (1 + tolerance),
+                        base['p50_ms'] + NOISE_MS)
+            if current['p50_ms'] > limit:
+                regressions.append(
+                    f'{key}: p50 {current["p50_ms"]} мс, '
+                    f'было {base["p50_ms"]} мс'
+                )
+        return regressions, warnings
+
+    def handle(self, *args, **options):
+        with test_environment(), override_settings(CACHES=BENCHMARK_CACHES):
+            results = self.run(options)
+        report = {
+            'params': {
+                key: options[key] for key in (
+                    'posts', 'users', 'groups', 'follows', 'comments',
+                    'hot_posts', 'hot_comments', 'repeat', 'seed', 'cold',
+                )
+            },
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': sqlite3.sqlite_version,
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+        if not options['baseline']:
+            return
+        with open(options['baseline']) as source:
+            baseline = json.load(source)
+        regressions, warnings = self.compare(
+            report['params'], results, baseline, options['tolerance']
+        )
+        for warning in sorted(warnings):
+            self.stdout.write(self.style.WARNING(warning))
+        if regressions:
+            raise CommandError(
+                'Ухудшения относительно базовых результатов:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Результаты не хуже базовых'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счётчики постов, комментариев и '
+        'подписок с реальными данными'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Исправить найденные расхождения',
+        )
+
+    def handle(self, *args, fix=False, **options):
+        drift = list(counters.find_drift())
+        for model, pk, field, stored, actual in drift:
+            self.stdout.write(
+                f'{model} {pk}: {field} = {stored}, на самом деле {actual}'
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        if fix:
+            counters.repair(drift)
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено расхождений: {len(drift)}'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Найдено расхождений: {len(drift)}; '
+                'запустите с --fix, чтобы исправить'
+            ))
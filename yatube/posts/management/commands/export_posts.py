@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты и комментарии автора в JSONL или CSV, по желанию '
+        'вместе с картинками в zip. Пишет потоком, память не зависит от '
+        'объёма выгрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--format', dest='export_format',
+            choices=export.FORMATS, default='jsonl',
+        )
+        parser.add_argument(
+            '--images',
+            action='store_true',
+            help='Упаковать выгрузку и картинки постов в zip',
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки; без него — stdout',
+        )
+
+    def handle(self, *args, username, export_format, images, output,
+               **options):
+        author = User.objects.filter(username=username).first()
+        if author is None:
+            raise CommandError(f'Нет пользователя {username}')
+        if images and output is None:
+            raise CommandError('Архив с картинками пишется только в --output')
+        if images:
+            chunks = export.zip_stream(author, export_format)
+        else:
+            chunks = export.stream(author, export_format)
+        if output is None:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(output, 'wb') as target:
+            for chunk in chunks:
+                target.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Выгрузка сохранена в {output}'))
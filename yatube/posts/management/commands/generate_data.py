@@ -0,0 +1,117 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.seed import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'подписками и комментариями для воспроизведения медленных '
+        'страниц на данных размера продакшена'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument(
+            '--follows', type=int, default=100,
+            help='Среднее число подписок на пользователя',
+        )
+        parser.add_argument(
+            '--follow-exponent', type=float, default=1.0,
+            help='Показатель степенного распределения популярности '
+                 'авторов; 0 — равномерные подписки',
+        )
+        parser.add_argument('--comments', type=int, default=2000000)
+        parser.add_argument(
+            '--hot-posts', type=int, default=100,
+            help='Число постов с длинными обсуждениями',
+        )
+        parser.add_argument(
+            '--hot-comments', type=int, default=2000,
+            help='Комментариев в каждом длинном обсуждении',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1',
+        )
+        parser.add_argument(
+            '--image-pool', type=int, default=20,
+            help='Сколько разных картинок создать для постов',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--timelines',
+            action='store_true',
+            help='Заполнить ленты подписок: при размерах по умолчанию это '
+                 'около ста миллионов строк, поэтому по умолчанию ленты '
+                 'не заполняются (можно позже командой rebuild_timelines)',
+        )
+
+    def progress(self, label, done, total):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'\r{label}: {done}/{total} '
+            f'({done / elapsed:.0f} в секунду)',
+            ending='',
+        )
+        self.in_progress = True
+
+    def step(self, label, action, *args, **kwargs):
+        self.started = time.monotonic()
+        self.in_progress = False
+        result = action(*args, **kwargs)
+        if self.in_progress:
+            self.stdout.write('')
+        self.stdout.write(
+            f'{label}: {time.monotonic() - self.started:.1f} с'
+        )
+        return result
+
+    def tune_database(self):
+        if connection.vendor == 'sqlite':
+            # Страничный кэш в 256 МБ: вставка в индексы не упирается
+            # в чтение страниц с диска.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size = -262144')
+
+    def handle(self, *args, **options):
+        self.tune_database()
+        seeder = Seeder(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=self.progress,
+        )
+        total = time.monotonic()
+        with transaction.atomic():
+            user_ids = self.step('users', seeder.users, options['users'])
+            group_ids = self.step('groups', seeder.groups, options['groups'])
+            if options['images']:
+                self.step(
+                    'images', seeder.image_pool, options['image_pool']
+                )
+            post_ids = self.step(
+                'posts', seeder.posts, options['posts'], user_ids, group_ids,
+                image_share=options['images'],
+            )
+            self.step(
+                'follows', seeder.follows, user_ids, user_ids,
+                options['follows'], options['follow_exponent'],
+            )
+            self.step(
+                'comments', seeder.comments, post_ids, user_ids,
+                options['comments'], options['hot_posts'],
+                options['hot_comments'],
+            )
+            self.step('counters', seeder.counters)
+        if options['timelines']:
+            self.step('timelines', seeder.timelines)
+        self.step('caches', seeder.invalidate)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - total:.1f} с'
+        ))
@@ -0,0 +1,61 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты и комментарии из JSONL (формат выгрузки '
+        'export_posts) пачками bulk_create с датами источника. Счётчики, '
+        'ленты подписок и кэш лент обновляются один раз в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSONL; «-» — stdin')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Записей в одной транзакции',
+        )
+        parser.add_argument(
+            '--create-missing',
+            action='store_true',
+            help='Создавать отсутствующих авторов и группы, '
+                 'а не пропускать их записи',
+        )
+
+    def report(self, imported, skipped):
+        self.stdout.write(
+            f'\rпостов: {imported["posts"]}, '
+            f'комментариев: {imported["comments"]}, '
+            f'пропущено: {sum(skipped.values())}',
+            ending='',
+        )
+
+    def handle(self, *args, path, batch_size, create_missing, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        importer = Importer(
+            batch_size=batch_size,
+            create_missing=create_missing,
+            progress=self.report,
+        )
+        if path == '-':
+            importer.run(sys.stdin)
+        else:
+            try:
+                source = open(path, encoding='utf-8')
+            except OSError as error:
+                raise CommandError(f'Не удалось открыть {path}: {error}')
+            with source:
+                importer.run(source)
+        self.stdout.write('')
+        for reason, count in sorted(importer.skipped.items()):
+            self.stdout.write(
+                self.style.WARNING(f'пропущено {reason}: {count}')
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {importer.imported["posts"]}, '
+            f'комментариев: {importer.imported["comments"]}'
+        ))
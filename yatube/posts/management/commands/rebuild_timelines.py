@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок из Follow и Post'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            help='Пересобрать ленту только этого пользователя '
+                 '(можно указать несколько раз)',
+        )
+
+    def handle(self, *args, usernames=None, **options):
+        user_ids = None
+        if usernames:
+            user_ids = list(
+                User.objects.filter(username__in=usernames)
+                .values_list('id', flat=True)
+            )
+        processed = timeline.rebuild(user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, обработано подписок: {processed}'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает авторов, посты которых не раскладываются по лентам '
+        '(FANOUT_FOLLOWER_THRESHOLD), и дозаполняет ленты подписчиков '
+        'авторов, вышедших из их числа. Запускается по расписанию'
+    )
+
+    def handle(self, *args, **options):
+        hot = timeline.refresh_hot_authors()
+        if hot is None:
+            self.stdout.write(self.style.WARNING(
+                'Пересчёт уже идёт в другом процессе'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов без раскладки по лентам: {len(hot)}'
+        ))
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .caching import page_scope, version
+from .queries import QueryLog, budget_for
+
+PAGE_KEY = 'page:{}:{}'
+PAGE_PARAMS = {'page', 'cursor'}
+CACHE_HEADER = 'X-Page-Cache'
+
+logger = logging.getLogger('posts.queries')
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш готовых страниц лент для анонимных читателей.
+
+    Стоит в начале MIDDLEWARE: запрос без сессионной cookie получает
+    сохранённый ответ, не проходя сессии, аутентификацию, запросы
+    пагинатора и рендеринг. Ключ составлен из пути, номера страницы и
+    поколения ленты, поэтому запись в посты сразу делает кэш неактуальным.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def page_key(self, request):
+        if not settings.PAGE_CACHE_TIMEOUT:
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+        if set(request.GET) - PAGE_PARAMS:
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        scope = page_scope(match)
+        if scope is None:
+            return None
+        page = '|'.join(
+            f'{name}={request.GET.get(name, "")}'
+            for name in sorted(PAGE_PARAMS)
+        )
+        digest = hashlib.md5(
+            f'{request.path_info}?{page}'.encode()
+        ).hexdigest()
+        return PAGE_KEY.format(digest, version(scope))
+
+    def __call__(self, request):
+        key = self.page_key(request)
+        if key is None:
+            return self.get_response(request)
+        response = cache.get(key)
+        if response is not None:
+            # Валидаторы сохранённого ответа вычислены для той же версии
+            # ленты, поэтому на них можно ответить 304.
+            response = get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')
+                ),
+                response=response,
+            )
+            response[CACHE_HEADER] = 'HIT'
+            return response
+        response = self.get_response(request)
+        if (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        ):
+            cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        response[CACHE_HEADER] = 'MISS'
+        return response
+
+
+class QueryBudgetMiddleware:
+    """Учёт запросов к базе для каждого view.
+
+    Пишет в заголовок Server-Timing число и время запросов, а в лог
+    posts.queries — повторяющиеся запросы (вероятные N+1) и превышение
+    бюджета из settings.QUERY_BUDGETS. Бюджеты относятся к чтению:
+    запросы GET и HEAD; отправка форм пишет в базу сколько нужно.
+    Включается настройкой QUERY_BUDGET_ENABLED, по умолчанию — когда
+    включён DEBUG (тесты его выключают).
+    """
+
+    def __init__(self, get_response):
+        enabled = settings.QUERY_BUDGET_ENABLED
+        if enabled is None:
+            enabled = settings.DEBUG
+        if not enabled:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryLog() as log:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match else request.path_info
+        response['Server-Timing'] = (
+            f'db;dur={log.duration * 1000:.1f};desc="{log.count} queries"'
+        )
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        for shape, times in log.repeated().items():
+            logger.warning(
+                'Возможный N+1 в %s: запрос выполнен %d раз: %s',
+                view_name, times, shape,
+            )
+        budget = budget_for(view_name)
+        if budget is not None and log.count > budget:
+            logger.warning(
+                '%s выполнил %d запросов при бюджете %d',
+                view_name, log.count, budget,
+            )
+        logger.debug(
+            '%s: %d запросов, %.1f мс',
+            view_name, log.count, log.duration * 1000,
+        )
+        return response
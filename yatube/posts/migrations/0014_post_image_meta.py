@@ -0,0 +1,66 @@
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def fill_image_meta(apps, schema_editor):
+    # Картинку могут делить несколько постов, поэтому читаем каждый файл
+    # один раз и обновляем все его посты одним запросом.
+    Post = apps.get_model('posts', 'Post')
+    names = (
+        Post.objects.exclude(image='')
+        .order_by()
+        .values_list('image', flat=True)
+        .distinct()
+    )
+    for name in names.iterator():
+        if not default_storage.exists(name):
+            continue
+        with default_storage.open(name) as image:
+            width, height = get_image_dimensions(image)
+        Post.objects.filter(image=name).update(
+            image_width=width,
+            image_height=height,
+            image_bytes=default_storage.size(name),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_bytes',
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name='Размер картинки в байтах',
+            ),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name='Высота картинки',
+            ),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name='Ширина картинки',
+            ),
+        ),
+        migrations.RunPython(fill_image_meta, migrations.RunPython.noop),
+    ]
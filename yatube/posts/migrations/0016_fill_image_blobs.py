@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def fill_image_blobs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    images = (
+        Post.objects.exclude(image='')
+        .order_by()
+        .values_list('image')
+        .annotate(refs=Count('pk'))
+    )
+    ImageBlob.objects.bulk_create(
+        ImageBlob(name=name, refs=refs)
+        for name, refs in images.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_image_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_image_blobs, migrations.RunPython.noop),
+    ]
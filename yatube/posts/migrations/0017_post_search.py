@@ -0,0 +1,56 @@
+from django.db import migrations
+
+# Полнотекстовый индекс постов для SQLite. Триггеры, которые держат его
+# в актуальном состоянии, создаёт posts.search.install() после миграций,
+# а перед ними снимает posts.search.uninstall(): SQLite пересоздаёт
+# таблицу posts_post при изменении её полей и падает на триггерах,
+# которые на неё ссылаются. На других СУБД миграция ничего не делает,
+# а поиск работает через LIKE.
+CREATE = [
+    '''
+    CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+        text, group_title, author_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    ''',
+    '''
+    INSERT INTO posts_post_fts(rowid, text, group_title, author_name)
+    SELECT posts_post.id, posts_post.text,
+        COALESCE(posts_group.title, ''),
+        auth_user.username || ' ' || auth_user.first_name
+            || ' ' || auth_user.last_name
+    FROM posts_post
+    JOIN auth_user ON auth_user.id = posts_post.author_id
+    LEFT JOIN posts_group ON posts_group.id = posts_post.group_id
+    ''',
+]
+DROP = [
+    'DROP TRIGGER IF EXISTS auth_user_fts_update',
+    'DROP TRIGGER IF EXISTS posts_group_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0016_fill_image_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='hot',
+            field=models.BooleanField(db_index=True, default=False, editable=False, help_text='Посты автора не раскладываются по лентам подписчиков', verbose_name='Горячий автор'),
+        ),
+    ]
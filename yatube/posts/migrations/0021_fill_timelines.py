@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Сколько последних постов автора попадает в ленту подписчика
+# (settings.TIMELINE_BACKFILL на момент миграции).
+BACKFILL = 1000
+FILL = '''
+    INSERT INTO posts_timeline (user_id, post_id, author_id, pub_date)
+    SELECT posts_follow.user_id, recent.id, recent.author_id, recent.pub_date
+    FROM posts_follow
+    JOIN (
+        SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+            PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+        ) AS position
+        FROM posts_post
+    ) AS recent ON recent.author_id = posts_follow.author_id
+    WHERE recent.position <= %s
+        AND posts_follow.author_id NOT IN (
+            SELECT user_id FROM posts_userstats WHERE hot = %s
+        )
+'''
+
+
+def fill_timelines(apps, schema_editor):
+    # Ленты подписок появились в 0009 пустыми: заполняем их по
+    # существующим подпискам.
+    Timeline = apps.get_model('posts', 'Timeline')
+    Timeline.objects.all().delete()
+    schema_editor.execute(FILL, params=[BACKFILL, True])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_userstats_hot'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+"""Учёт SQL-запросов, выполненных за время запроса к сайту.
+
+QueryLog собирает текст и длительность каждого запроса через
+connection.execute_wrapper(). Запросы группируются по «отпечатку» — тексту
+SQL без значений параметров: одинаковый отпечаток, повторённый много раз
+за один запрос, почти всегда означает N+1 (ленивую загрузку связанного
+объекта в цикле шаблона).
+"""
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+# Списки IN (%s, %s, ...) разной длины дают один отпечаток.
+PLACEHOLDER_LIST = re.compile(r'\(\s*%s(\s*,\s*%s)*\s*\)')
+NUMBER = re.compile(r'\b\d+\b')
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Форма запроса без значений: по ней ищутся повторы."""
+    sql = PLACEHOLDER_LIST.sub('(%s...)', sql)
+    sql = NUMBER.sub('N', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def budget_for(view_name):
+    """Допустимое число запросов для view или None, если не задано."""
+    return settings.QUERY_BUDGETS.get(view_name)
+
+
+class QueryLog:
+    """Контекстный менеджер, записывающий запросы к базе.
+
+    with QueryLog() as log:
+        ...
+    log.count, log.duration, log.repeated()
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.monotonic() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        """Суммарное время запросов в секундах."""
+        return sum(duration for sql, duration in self.queries)
+
+    def fingerprints(self):
+        return Counter(fingerprint(sql) for sql, duration in self.queries)
+
+    def repeated(self, threshold=None):
+        """Отпечатки, повторённые не меньше threshold раз: вероятные N+1."""
+        if threshold is None:
+            threshold = settings.QUERY_REPEAT_THRESHOLD
+        return {
+            shape: times
+            for shape, times in self.fingerprints().items()
+            if times >= threshold
+        }
@@ -0,0 +1,239 @@
+"""Полнотекстовый поиск постов.
+
+На SQLite посты ищутся по виртуальной таблице FTS5 posts_post_fts
+(текст поста, название группы, имя автора) и сортируются по bm25. Индекс
+обновляют триггеры на posts_post, posts_group и auth_user, так что в него
+попадают и посты, вставленные мимо ORM. На других СУБД поиск сводится к
+icontains по тем же полям, от новых постов к старым.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+TABLE = 'posts_post_fts'
+# Веса колонок для bm25: совпадение в тексте поста важнее, чем в
+# названии группы или имени автора.
+WEIGHTS = (1.0, 0.5, 0.5)
+# Слов в запросе больше этого не учитываем: каждое слово — отдельный
+# обход индекса.
+MAX_TERMS = 8
+TERM = re.compile(r'\w+')
+
+AUTHOR_NAME = "{0}.username || ' ' || {0}.first_name || ' ' || {0}.last_name"
+INDEX_POST = f'''
+    INSERT INTO {TABLE}(rowid, text, group_title, author_name)
+    SELECT new.id, new.text,
+        COALESCE((SELECT title FROM posts_group WHERE id = new.group_id), ''),
+        (SELECT {AUTHOR_NAME.format('auth_user')} FROM auth_user
+         WHERE id = new.author_id);
+'''
+# Триггеры ссылаются на posts_post, и SQLite проверяет их тела, когда
+# миграция пересоздаёт эту таблицу или её соседей: на время миграций
+# триггеры снимаются (uninstall) и ставятся заново после них (install).
+TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+    AFTER INSERT ON posts_post
+    BEGIN {INDEX_POST} END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+    AFTER UPDATE OF text, group_id, author_id ON posts_post
+    WHEN old.text IS NOT new.text
+        OR old.group_id IS NOT new.group_id
+        OR old.author_id IS NOT new.author_id
+    BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id;
+        {INDEX_POST}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+    AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS posts_group_fts_update
+    AFTER UPDATE OF title ON posts_group
+    WHEN old.title IS NOT new.title
+    BEGIN
+        UPDATE {TABLE} SET group_title = new.title
+        WHERE rowid IN (SELECT id FROM posts_post WHERE group_id = new.id);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS auth_user_fts_update
+    AFTER UPDATE OF username, first_name, last_name ON auth_user
+    WHEN old.username IS NOT new.username
+        OR old.first_name IS NOT new.first_name
+        OR old.last_name IS NOT new.last_name
+    BEGIN
+        UPDATE {TABLE} SET author_name = {AUTHOR_NAME.format('new')}
+        WHERE rowid IN (SELECT id FROM posts_post WHERE author_id = new.id);
+    END
+    ''',
+)
+TRIGGER_NAMES = (
+    'posts_post_fts_insert',
+    'posts_post_fts_update',
+    'posts_post_fts_delete',
+    'posts_group_fts_update',
+    'auth_user_fts_update',
+)
+REBUILD = (
+    f'DELETE FROM {TABLE}',
+    f'''
+    INSERT INTO {TABLE}(rowid, text, group_title, author_name)
+    SELECT posts_post.id, posts_post.text,
+        COALESCE(posts_group.title, ''),
+        {AUTHOR_NAME.format('auth_user')}
+    FROM posts_post
+    JOIN auth_user ON auth_user.id = posts_post.author_id
+    LEFT JOIN posts_group ON posts_group.id = posts_post.group_id
+    ''',
+    # Сливает сегменты индекса в один: запросы читают меньше страниц.
+    f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')",
+)
+
+
+# Базы, где индекс уже найден: table_names() — лишний запрос на каждый
+# поиск.
+_available = set()
+
+
+def available(using=connection):
+    key = (using.alias, using.settings_dict['NAME'])
+    if key in _available:
+        return True
+    if using.vendor != 'sqlite':
+        return False
+    if TABLE not in using.introspection.table_names():
+        return False
+    _available.add(key)
+    return True
+
+
+def install(using=connection):
+    """Создаёт недостающие триггеры индекса."""
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        for statement in TRIGGERS:
+            cursor.execute(statement)
+
+
+def uninstall(using=connection):
+    """Удаляет триггеры индекса перед миграциями."""
+    if using.vendor != 'sqlite':
+        return
+    # Миграция может удалить и саму таблицу индекса.
+    _available.discard((using.alias, using.settings_dict['NAME']))
+    with using.cursor() as cursor:
+        for name in TRIGGER_NAMES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def rebuild(using=connection):
+    """Строит индекс заново по текущим постам; возвращает их число."""
+    install(using)
+    with using.cursor() as cursor:
+        for statement in REBUILD:
+            cursor.execute(statement)
+        cursor.execute(f'SELECT count(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_query(query):
+    """Запрос пользователя на языке FTS5.
+
+    Каждое слово ищется как префикс (так находятся и другие формы
+    слова), все слова обязательны. Кавычки и операторы FTS5 из запроса
+    отбрасываются.
+    """
+    terms = TERM.findall(query.lower())[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+class SearchResults:
+    """Найденные посты по убыванию релевантности.
+
+    Поддерживает count() и срезы, поэтому листается обычным Paginator:
+    срез читает из индекса только id своей страницы.
+    """
+
+    def __init__(self, query):
+        self.match = match_query(query)
+
+    def _execute(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if not self.match:
+            return 0
+        return self._execute(
+            f'SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH %s',
+            [self.match],
+        )[0][0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if not self.match or index.stop is not None and index.stop <= start:
+            return []
+        limit = -1 if index.stop is None else index.stop - start
+        weights = ', '.join(map(str, WEIGHTS))
+        ids = [row[0] for row in self._execute(
+            f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+            f'ORDER BY bm25({TABLE}, {weights}), rowid DESC '
+            f'LIMIT %s OFFSET %s',
+            [self.match, limit, start],
+        )]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def filter_posts(posts, query):
+    """Оставляет в posts найденные по запросу query, без ранжирования.
+
+    Порядок и прочие условия posts сохраняются; так ищет админка.
+    """
+    if available():
+        match = match_query(query)
+        if not match:
+            return posts.none()
+        return posts.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [match]
+        ))
+    terms = TERM.findall(query)[:MAX_TERMS]
+    if not terms:
+        return posts.none()
+    for term in terms:
+        posts = posts.filter(
+            Q(text__icontains=term)
+            | Q(group__title__icontains=term)
+            | Q(author__username__icontains=term)
+            | Q(author__first_name__icontains=term)
+            | Q(author__last_name__icontains=term)
+        )
+    return posts
+
+
+def search(query):
+    """Посты, найденные по запросу query."""
+    if available():
+        return SearchResults(query)
+    return filter_posts(
+        Post.objects.select_related('author', 'group'), query
+    )
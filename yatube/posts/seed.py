@@ -0,0 +1,337 @@
+"""Массовое наполнение базы синтетическими данными.
+
+Пользователи и группы создаются bulk_create, а посты, подписки и
+комментарии — пачками кортежей через executemany(): на миллионах строк
+сборка запроса и экземпляров модели в bulk_create стоит дороже самой
+вставки. Всё идёт мимо сигналов, поэтому после загрузки счётчики и ленты
+подписок пересчитываются целиком (finish()).
+Все случайные решения берутся из random.Random(seed): одинаковые
+параметры дают одинаковые данные.
+
+Faker на каждый объект слишком медленный для миллионов строк, поэтому
+он заполняет небольшие пулы предложений и имён, а тексты собираются из
+них случайным выбором.
+"""
+import bisect
+import io
+import itertools
+import random
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from . import caching, counters, following, timeline
+from .models import Comment, Follow, Group, Post, User
+
+USER_PREFIX = 'seed_'
+GROUP_PREFIX = 'seed-'
+USERNAME = USER_PREFIX + '{}'
+GROUP_SLUG = GROUP_PREFIX + '{}'
+IMAGE_NAME = 'posts/seed/{}_{}.png'
+IMAGE_SIZE = (960, 540)
+# Доля постов без группы.
+NO_GROUP = 0.3
+POST_FIELDS = (
+    'text', 'pub_date', 'updated', 'author', 'group', 'image',
+    'image_width', 'image_height', 'image_bytes', 'comments_count',
+    'version',
+)
+NO_IMAGE = ('', None, None, None)
+COMMENT_FIELDS = ('text', 'created', 'post', 'author')
+SENTENCES = 2000
+NAMES = 500
+
+
+def batched(objects, size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _last_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+class Seeder:
+    """Создаёт пользователей, группы, посты, подписки и комментарии.
+
+    Каждый метод возвращает id созданных объектов. progress, если задан,
+    вызывается после каждой пачки: progress(label, done, total).
+    """
+
+    def __init__(self, seed=0, batch_size=1000, days=365, progress=None):
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.span = timedelta(days=days).total_seconds()
+        self.now = timezone.now()
+        self.progress = progress
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        self.sentences = [fake.sentence() for _ in range(SENTENCES)]
+        self.first_names = [fake.first_name() for _ in range(NAMES)]
+        self.last_names = [fake.last_name() for _ in range(NAMES)]
+        self.images = []
+
+    def _create(self, model, objects, total, label):
+        last_id = _last_id(model)
+        fields = model._meta.concrete_fields
+        done = 0
+        for batch in batched(objects, self.batch_size):
+            # Пачка не больше, чем допускает база: у SQLite ограничено
+            # число параметров в одном запросе.
+            size = min(
+                len(batch), connection.ops.bulk_batch_size(fields, batch)
+            )
+            model.objects.bulk_create(batch, batch_size=size)
+            done += len(batch)
+            if self.progress:
+                self.progress(label, done, total)
+        return list(
+            model.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def _insert(self, model, fields, rows, total, label):
+        """Вставляет кортежи значений полей fields пачками по batch_size.
+
+        Значения должны быть уже подготовлены для базы, даты — через
+        db_moment().
+        """
+        last_id = _last_id(model)
+        opts = model._meta
+        quote = connection.ops.quote_name
+        columns = [quote(opts.get_field(name).column) for name in fields]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(opts.db_table),
+            ', '.join(columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        done = 0
+        with connection.cursor() as cursor:
+            for batch in batched(rows, self.batch_size):
+                cursor.executemany(sql, batch)
+                done += len(batch)
+                if self.progress:
+                    self.progress(label, done, total)
+        return list(
+            model.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def moment(self):
+        """Случайный момент в пределах последних days дней."""
+        return self.now - timedelta(seconds=self.random.uniform(0, self.span))
+
+    def db_moment(self, moment=None):
+        return connection.ops.adapt_datetimefield_value(
+            moment or self.moment()
+        )
+
+    def moments(self, count):
+        """count моментов по возрастанию в пределах последних days дней.
+
+        Посты вставляются в порядке публикации, как на живом сайте:
+        индексы по дате растут с конца, а не перестраиваются в случайных
+        местах.
+        """
+        step = self.span / max(count, 1)
+        moment = self.now - timedelta(seconds=self.span)
+        for _ in range(count):
+            moment += timedelta(seconds=self.random.expovariate(1 / step))
+            yield self.db_moment(moment)
+
+    def text(self, sentences):
+        return ' '.join(
+            self.random.choice(self.sentences) for _ in range(sentences)
+        )
+
+    def users(self, count):
+        start = User.objects.filter(username__startswith=USER_PREFIX).count()
+        return self._create(User, (
+            User(
+                username=USERNAME.format(start + i),
+                first_name=self.random.choice(self.first_names),
+                last_name=self.random.choice(self.last_names),
+                password='!',
+            )
+            for i in range(count)
+        ), count, 'users')
+
+    def groups(self, count):
+        start = Group.objects.filter(slug__startswith=GROUP_PREFIX).count()
+        return self._create(Group, (
+            Group(
+                title=self.random.choice(self.sentences)[:200],
+                slug=GROUP_SLUG.format(start + i),
+                description=self.text(3),
+            )
+            for i in range(count)
+        ), count, 'groups')
+
+    def image_pool(self, count):
+        """Сохраняет count картинок, которые затем делят посты."""
+        for number in range(count):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            content = io.BytesIO()
+            Image.new('RGB', IMAGE_SIZE, color).save(content, 'PNG')
+            name = IMAGE_NAME.format(self.seed, number)
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(
+                    content.getvalue()
+                ))
+            self.images.append(
+                (name, *IMAGE_SIZE, default_storage.size(name))
+            )
+            if self.progress:
+                self.progress('images', number + 1, count)
+
+    def pick_group(self, group_ids):
+        if not group_ids or self.random.random() < NO_GROUP:
+            return None
+        return self.random.choice(group_ids)
+
+    def pick_image(self, image_share):
+        if not self.images or self.random.random() >= image_share:
+            return NO_IMAGE
+        return self.random.choice(self.images)
+
+    def posts(self, count, author_ids, group_ids, image_share=0):
+        """count постов; доля image_share получает картинку из пула."""
+        return self._insert(Post, POST_FIELDS, (
+            self.post(pub_date, author_ids, group_ids, image_share)
+            for pub_date in self.moments(count)
+        ), count, 'posts')
+
+    def post(self, pub_date, author_ids, group_ids, image_share):
+        return (
+            self.text(self.random.randint(1, 6)),
+            pub_date,
+            pub_date,
+            self.random.choice(author_ids),
+            self.pick_group(group_ids),
+            *self.pick_image(image_share),
+            0,
+            1,
+        )
+
+    def follows(self, user_ids, author_ids, per_user, exponent=0):
+        """Подписки пользователей на авторов.
+
+        При exponent=0 каждый подписывается ровно на per_user случайных
+        авторов. Иначе граф степенной: популярность автора убывает как
+        1 / rank ** exponent, а число подписок читателя распределено по
+        Парето со средним per_user.
+        """
+        per_user = min(per_user, len(author_ids) - 1)
+        if exponent:
+            authors = self.random.sample(author_ids, len(author_ids))
+            weights = itertools.accumulate(
+                1 / rank ** exponent for rank in range(1, len(authors) + 1)
+            )
+            choose = self.popular_authors(authors, list(weights))
+        else:
+            choose = self.random_authors(author_ids)
+        return self._insert(Follow, ('user', 'author'), (
+            (user_id, author_id)
+            for user_id in user_ids
+            for author_id in choose(user_id, self.follow_count(
+                per_user, exponent, len(author_ids) - 1
+            ))
+        ), len(user_ids) * per_user, 'follows')
+
+    def follow_count(self, per_user, exponent, limit):
+        if not exponent:
+            return per_user
+        # Среднее распределения Парето с параметром 2 равно двум.
+        return min(int(per_user * self.random.paretovariate(2) / 2), limit)
+
+    def random_authors(self, author_ids):
+        def choose(user_id, count):
+            authors = self.random.sample(author_ids, count + 1)
+            if user_id in authors:
+                authors.remove(user_id)
+            return authors[:count]
+        return choose
+
+    def popular_authors(self, authors, cum_weights):
+        total = cum_weights[-1]
+
+        def choose(user_id, count):
+            chosen = set()
+            # Повторные выборы популярных авторов отбрасываются; число
+            # попыток ограничено, чтобы не застрять на малом графе.
+            for _ in range(count * 4):
+                point = self.random.random() * total
+                index = bisect.bisect(cum_weights, point)
+                author_id = authors[min(index, len(authors) - 1)]
+                if author_id != user_id:
+                    chosen.add(author_id)
+                if len(chosen) == count:
+                    break
+            return chosen
+        return choose
+
+    def comments(self, post_ids, user_ids, count, hot_posts=0, per_hot=0):
+        """count комментариев к случайным постам и по per_hot комментариев
+        к hot_posts постам, чтобы проверить длинные обсуждения."""
+        hot = self.random.sample(post_ids, min(hot_posts, len(post_ids)))
+        total = len(hot) * per_hot + count
+        # Комментарии одного поста вставляются подряд: индекс по посту
+        # заполняется последовательно.
+        targets = itertools.chain(
+            (post_id for post_id in hot for _ in range(per_hot)),
+            sorted(self.random.choice(post_ids) for _ in range(count)),
+        )
+        return self._insert(Comment, COMMENT_FIELDS, (
+            (
+                self.text(self.random.randint(1, 3)),
+                self.db_moment(),
+                post_id,
+                self.random.choice(user_ids),
+            )
+            for post_id in targets
+        ), total, 'comments')
+
+    def counters(self):
+        counters.recount_all()
+
+    def timelines(self):
+        # Популярные авторы отмечаются «горячими» до заполнения лент,
+        # иначе их посты разложились бы по лентам всех подписчиков.
+        timeline.refresh_hot_authors()
+        timeline.rebuild()
+
+    def invalidate(self):
+        """Сбрасывает кэш лент, в которые попали созданные посты,
+        и множества подписок созданных пользователей."""
+        users = User.objects.filter(username__startswith=USER_PREFIX)
+        usernames = users.values_list('username', flat=True)
+        slugs = Group.objects.filter(
+            slug__startswith=GROUP_PREFIX
+        ).values_list('slug', flat=True)
+        caching.bump(
+            caching.INDEX,
+            *map(caching.author_scope, usernames.iterator()),
+            *map(caching.group_scope, slugs.iterator()),
+        )
+        following.invalidate(users.values_list('id', flat=True))
+
+    def finish(self):
+        """Пересчитывает счётчики и ленты подписок после загрузки."""
+        self.counters()
+        self.timelines()
+        self.invalidate()
@@ -0,0 +1,255 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_delete, pre_migrate, pre_save,
+)
+from django.dispatch import receiver
+
+from . import (
+    caching, counters, following, search, thumbnails, timeline,
+)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Поля пользователя, которые выводятся в лентах и карточках постов.
+USER_SHOWN_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def bump_post_versions(posts):
+    """Меняет версию posts: их закэшированные карточки устаревают."""
+    posts.update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=User)
+def user_create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=User)
+def user_remember_shown(sender, instance, raw=False,
+                        update_fields=None, **kwargs):
+    instance._saved_shown = None
+    if raw or not instance.pk:
+        return
+    if update_fields is None or set(update_fields) & set(USER_SHOWN_FIELDS):
+        instance._saved_shown = (
+            User.objects.filter(pk=instance.pk)
+            .values_list(*USER_SHOWN_FIELDS)
+            .first()
+        )
+
+
+@receiver(post_save, sender=User)
+def user_bump_generation(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    saved = getattr(instance, '_saved_shown', None)
+    shown = tuple(getattr(instance, field) for field in USER_SHOWN_FIELDS)
+    # Смена пароля, вход, правка в админке без смены имени ленты не
+    # меняют.
+    if saved is None or saved == shown:
+        return
+    usernames = {instance.username, saved[0]}
+    # Имя автора выводится и в лентах групп, где он публиковался.
+    slugs = (
+        Group.objects.filter(posts__author=instance)
+        .values_list('slug', flat=True)
+        .distinct()
+    )
+    caching.bump(
+        caching.INDEX,
+        *map(caching.author_scope, usernames),
+        *map(caching.group_scope, slugs),
+    )
+    # Имя автора есть и в карточках его постов.
+    bump_post_versions(Post.objects.filter(author=instance))
+
+
+@receiver(pre_save, sender=Group)
+def group_remember_slug(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._saved_slug = (
+            Group.objects.filter(pk=instance.pk)
+            .values_list('slug', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_bump_generation(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    slugs = {instance.slug, getattr(instance, '_saved_slug', None)}
+    slugs.discard(None)
+    # Ссылка на группу выводится и в профилях её авторов.
+    usernames = (
+        User.objects.filter(posts__group=instance)
+        .values_list('username', flat=True)
+        .distinct()
+    )
+    caching.bump(
+        caching.INDEX,
+        *map(caching.group_scope, slugs),
+        *map(caching.author_scope, usernames),
+    )
+    # Ссылка на группу есть в карточках её постов, а при удалении группы
+    # они её теряют.
+    bump_post_versions(Post.objects.filter(group=instance))
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_saved(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        (
+            instance._saved_group_id,
+            instance._saved_image,
+            instance._saved_version,
+        ) = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image', 'version')
+            .first()
+        ) or (None, None, None)
+
+
+@receiver(pre_save, sender=Post)
+def post_bump_version(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    # save(update_fields=...) без version сохраняет служебные поля,
+    # которых нет в карточке. Версия отсчитывается от записанной в базе:
+    # у загруженного раньше объекта она могла устареть.
+    saved_version = getattr(instance, '_saved_version', None)
+    if raw or saved_version is None:
+        return
+    if update_fields is None or 'version' in update_fields:
+        instance.version = saved_version + 1
+
+
+def image_changed(instance, created):
+    return created or (
+        instance.image.name != getattr(instance, '_saved_image', None)
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_schedule_thumbnails(sender, instance, created, raw=False,
+                             **kwargs):
+    if instance.image and not raw and image_changed(instance, created):
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def post_count_image(sender, instance, created, raw=False, **kwargs):
+    if raw or not image_changed(instance, created):
+        return
+    counters.bump_image(instance.image.name, 1)
+    if not created:
+        counters.bump_image(getattr(instance, '_saved_image', None), -1)
+
+
+@receiver(post_save, sender=Post)
+def post_count(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+        return
+    saved_group_id = getattr(instance, '_saved_group_id', None)
+    if saved_group_id != instance.group_id:
+        counters.bump_group(saved_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_bump_generation(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump(*caching.post_scopes(instance))
+
+
+@receiver(post_delete, sender=Post)
+def post_forget_recent(sender, instance, **kwargs):
+    timeline.forget_recent(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncount(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance.group_id, -1)
+    counters.bump_image(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncount(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_bump_generation(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Число подписчиков и подписок выводится в профилях обоих.
+    usernames = User.objects.filter(
+        pk__in=(instance.user_id, instance.author_id)
+    ).values_list('username', flat=True)
+    caching.bump(*map(caching.author_scope, usernames))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_forget(sender, instance, raw=False, **kwargs):
+    if not raw:
+        following.forget(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_prune(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_uncount(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(pre_migrate)
+def search_uninstall(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # SQLite пересоздаёт таблицу при изменении её полей и проверяет при
+    # этом триггеры, ссылающиеся на неё: на время миграций их не должно
+    # быть.
+    if sender.name == 'posts':
+        search.uninstall(connections[using])
+
+
+@receiver(post_migrate)
+def search_install(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    if sender.name == 'posts':
+        search.install(connections[using])
@@ -0,0 +1,46 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл называется SHA-256 своего содержимого: одинаковые картинки, сколько
+бы раз их ни загрузили, лежат на диске одним файлом, и sorl-thumbnail,
+ключи которого строятся по имени оригинала, делает для них одни общие
+миниатюры. Число постов, ссылающихся на файл, хранит ImageBlob (см.
+counters.bump_image); файл и его миниатюры удаляются, когда ссылок не
+остаётся.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    hash_algorithm = 'sha256'
+
+    def content_name(self, name, content):
+        """Имя posts/ab/<хэш>.<расширение> для содержимого content."""
+        digest = hashlib.new(self.hash_algorithm)
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            directory, hexdigest[:2], hexdigest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Те же байты уже сохранены: второй копии не делаем.
+            return name
+        # Если тот же файл одновременно сохраняет параллельный запрос,
+        # get_available_name() даст ему имя с суффиксом: редкий дубль
+        # безопаснее перезаписи файла, который уже читают.
+        return super().save(name, content, max_length)
@@ -0,0 +1,23 @@
+from django import template
+
+from posts.following import followed_authors
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_following(context):
+    """id авторов постов page_obj, на которых подписан читатель.
+
+    {% page_following as followed %}
+
+    Одно обращение к кэшу на страницу. Не использовать внутри
+    {% cache %}: закэшированный фрагмент общий для всех читателей.
+    """
+    request = context.get('request')
+    page = context.get('page_obj') or []
+    if request is None:
+        return set()
+    return followed_authors(request.user).following(
+        post.author_id for post in page
+    )
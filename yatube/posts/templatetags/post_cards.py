@@ -0,0 +1,18 @@
+from django import template
+
+from posts.cards import page_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Готовые карточки постов страницы: пары (пост, HTML).
+
+    {% post_cards page_obj as cards %}
+    {% for post, card in cards %}{{ card }}{% endfor %}
+
+    Закэшированные карточки читаются одним обращением к кэшу,
+    рендерятся только недостающие (см. posts.cards).
+    """
+    return page_cards(context, posts)
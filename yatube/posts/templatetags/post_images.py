@@ -0,0 +1,37 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+def _page_images(context):
+    """Картинки всех постов, которые выводит страница."""
+    page = context.get('page_obj')
+    if page is None:
+        post = context.get('post')
+        page = [post] if post is not None else []
+    return [getattr(post, 'image', None) for post in page]
+
+
+@register.simple_tag(takes_context=True)
+def post_picture(context, image):
+    """Готовые варианты картинки поста (thumbnails.Picture) или None.
+
+    {% post_picture post.image as picture %}
+
+    При первом вызове за запрос варианты картинок всех постов page_obj
+    (на странице поста — post) читаются одним обращением к хранилищу
+    ключей, следующие вызовы берут их из запомненного результата.
+    """
+    if not image:
+        return None
+    request = context.get('request')
+    if request is None:
+        return thumbnails.picture(image)
+    if not hasattr(request, '_post_pictures'):
+        request._post_pictures = thumbnails.prefetch(_page_images(context))
+    page = request._post_pictures
+    if image.name not in page:
+        page.update(thumbnails.prefetch([image]))
+    return thumbnails.Picture(page[image.name]) or None
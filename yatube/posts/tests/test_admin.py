@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(AdminTests.admin)
+
+    def create_rows(self, count):
+        start = Post.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f'author{i}')
+            post = Post.objects.create(
+                author=author, text=f'Пост номер {i}', group=AdminTests.group
+            )
+            Comment.objects.create(author=author, post=post, text='Коммент')
+            Follow.objects.create(user=AdminTests.admin, author=author)
+
+    def changelist_queries(self, model, data=None):
+        url = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_grow_with_rows(self):
+        """Проверяем, что число запросов списков админки не зависит
+        от числа строк на странице."""
+        self.create_rows(2)
+        before = {
+            model: self.changelist_queries(model)
+            for model in ('post', 'comment', 'follow')
+        }
+        self.create_rows(5)
+        for model, queries in before.items():
+            with self.subTest(model=model):
+                self.assertEqual(self.changelist_queries(model), queries)
+
+    def test_post_search_and_date_hierarchy(self):
+        """Проверяем поиск постов по индексу, выбранную группу в строке
+        и переход по датам."""
+        self.create_rows(3)
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url, {'q': 'номер 1'})
+        self.assertContains(
+            response, f'<option value="{AdminTests.group.pk}" selected>'
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            list(Post.objects.filter(text='Пост номер 1')),
+        )
+        year = Post.objects.first().pub_date.year
+        response = self.client.get(url, {'pub_date__year': year})
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_estimated_count(self):
+        """Проверяем, что без фильтров число строк оценивается по ключу,
+        а с фильтрами считается не дальше предела."""
+        self.create_rows(3)
+        posts = Post.objects.order_by('-pk')
+        Post.objects.filter(pk=posts.last().pk).delete()
+        largest = posts.first().pk
+        with override_settings(ADMIN_COUNT_LIMIT=1):
+            paginator = EstimatedCountPaginator(posts, 10)
+            with self.assertNumQueries(1):
+                self.assertEqual(paginator.count, largest)
+            filtered = posts.filter(group=AdminTests.group)
+            self.assertEqual(EstimatedCountPaginator(filtered, 10).count, 1)
+        self.assertEqual(EstimatedCountPaginator(posts, 10).count, 2)
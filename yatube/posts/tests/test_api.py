@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+from posts.tests.utils import QueryBudgetMixin
+
+
+class FeedApiTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for i in range(settings.POSTS_PER_PAGE + 1):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {i}',
+                group=cls.group,
+            )
+        cls.feeds = (
+            ('posts:api_index',),
+            ('posts:api_group_list', cls.group.slug),
+            ('posts:api_profile', cls.user.username),
+            ('posts:api_follow_index',),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(FeedApiTests.reader)
+
+    def test_feeds_walk_by_cursor(self):
+        """Проверяем, что ленты листаются курсором от новых постов
+        к старым и укладываются в бюджет запросов."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)
+        )
+        for url_name, *args in FeedApiTests.feeds:
+            with self.subTest(url_name=url_name):
+                response = self.assertQueryBudget(
+                    self.client, url_name, *args
+                )
+                first = response.json()
+                self.assertIsNone(first['previous'])
+                self.assertEqual(
+                    len(first['results']), settings.POSTS_PER_PAGE
+                )
+                second = self.client.get(first['next']).json()
+                self.assertIsNone(second['next'])
+                ids = [
+                    item['id']
+                    for item in first['results'] + second['results']
+                ]
+                self.assertEqual(ids, expected)
+
+    def test_page_links_relative(self):
+        """Проверяем, что ссылки на страницы не несут хост первого
+        запроса из кэша страниц."""
+        url = reverse('posts:api_index')
+        Client().get(url, HTTP_HOST='localhost')
+        response = Client().get(url, HTTP_HOST='127.0.0.1')
+        self.assertTrue(response.json()['next'].startswith(url + '?'))
+
+    def test_sparse_fieldsets(self):
+        """Проверяем, что fields= оставляет только запрошенные поля,
+        а неизвестное поле даёт 400."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url, {'fields': 'id,author,group'})
+        item = response.json()['results'][0]
+        self.assertEqual(item, {
+            'id': FeedApiTests.post.id,
+            'author': FeedApiTests.user.username,
+            'group': FeedApiTests.group.slug,
+        })
+        self.assertIn('fields=', response.json()['next'])
+        response = self.client.get(url, {'fields': 'text'})
+        self.assertEqual(
+            list(response.json()['results'][0]), ['text']
+        )
+        response = self.client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cache_headers_match_html(self):
+        """Проверяем, что JSON-ленты отдают Last-Modified и ETag и
+        отвечают 304 на условный запрос."""
+        pairs = (
+            ('posts:index', 'posts:api_index', ()),
+            ('posts:group_list', 'posts:api_group_list',
+             (FeedApiTests.group.slug,)),
+            ('posts:profile', 'posts:api_profile',
+             (FeedApiTests.user.username,)),
+        )
+        for html_name, api_name, args in pairs:
+            with self.subTest(api_name=api_name):
+                html = self.client.get(reverse(html_name, args=args))
+                response = self.client.get(reverse(api_name, args=args))
+                self.assertEqual(
+                    response['Last-Modified'], html['Last-Modified']
+                )
+                self.assertTrue(response.has_header('ETag'))
+                response = self.client.get(
+                    reverse(api_name, args=args),
+                    HTTP_IF_NONE_MATCH=response['ETag'],
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_follow_feed_requires_login(self):
+        """Проверяем, что лента подписок анониму отвечает 401."""
+        response = Client().get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts.models import Post
+
+SMALL = {
+    'posts': 30,
+    'users': 6,
+    'groups': 2,
+    'follows': 3,
+    'comments': 20,
+    'hot_posts': 1,
+    'hot_comments': 25,
+    'repeat': 2,
+}
+
+
+class BenchmarkViewsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, 'results.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_benchmark(self, **options):
+        call_command(
+            'benchmark_views', output=self.output, stdout=StringIO(),
+            **SMALL, **options,
+        )
+        with open(self.output) as source:
+            return json.load(source)
+
+    def test_results_cover_urls_and_roll_back(self):
+        """Проверяем, что замер проходит по всем адресам posts/urls.py,
+        пишет JSON и не оставляет данных в базе."""
+        report = self.run_benchmark()
+        results = report['results']
+        for name in ('index', 'post_detail', 'follow_index', 'post_edit'):
+            with self.subTest(name=name):
+                self.assertEqual(results[name]['status'], 200)
+                self.assertGreater(results[name]['queries'], 0)
+                self.assertLessEqual(
+                    results[name]['p50_ms'], results[name]['p99_ms']
+                )
+        self.assertIn('index?page=last', results)
+        self.assertFalse(Post.objects.exists())
+
+    def test_compare_with_baseline(self):
+        """Проверяем, что рост числа запросов относительно базовых
+        результатов считается ухудшением."""
+        report = self.run_benchmark()
+        report['results']['index']['queries'] = 0
+        baseline = os.path.join(self.directory.name, 'baseline.json')
+        with open(baseline, 'w') as output:
+            json.dump(report, output)
+        with self.assertRaisesMessage(CommandError, 'index: запросов'):
+            self.run_benchmark(baseline=baseline, tolerance=100)
+
+    def test_compare_checks_params_and_targets(self):
+        """Проверяем, что другие параметры данных и адрес, пропавший из
+        замера, считаются ухудшением, а новый адрес — предупреждением."""
+        report = self.run_benchmark()
+        baseline = os.path.join(self.directory.name, 'baseline.json')
+        changed = {**report, 'params': {**report['params'], 'posts': 40}}
+        with open(baseline, 'w') as output:
+            json.dump(changed, output)
+        with self.assertRaisesMessage(CommandError, 'параметр posts: 30'):
+            self.run_benchmark(baseline=baseline, tolerance=100)
+        report['results']['removed'] = report['results'].pop('index')
+        with open(baseline, 'w') as output:
+            json.dump(report, output)
+        with self.assertRaisesMessage(CommandError, 'removed: нет в'):
+            self.run_benchmark(baseline=baseline, tolerance=100)
+        del report['results']['removed']
+        with open(baseline, 'w') as output:
+            json.dump(report, output)
+        out = StringIO()
+        call_command(
+            'benchmark_views', baseline=baseline, tolerance=100, stdout=out,
+            **SMALL,
+        )
+        self.assertIn('index: нет в базовых результатах', out.getvalue())
@@ -0,0 +1,116 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import caching, cards
+from posts.models import Follow, Group, Post, User
+
+
+class CardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(3):
+            Post.objects.create(
+                author=cls.author, text=f'Тестовый пост {i}', group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(CardCacheTests.reader)
+
+    def get_follow(self):
+        return self.client.get(reverse('posts:follow_index'))
+
+    def test_cards_read_once_and_rendered_on_miss(self):
+        """Проверяем, что карточки страницы читаются одним get_many,
+        а при попадании в кэш шаблон карточки не рендерится."""
+        with mock.patch('posts.cards.render', wraps=cards.render) as render:
+            first = self.get_follow()
+            self.assertEqual(render.call_count, 3)
+            render.reset_mock()
+            with mock.patch('posts.cards.cache', wraps=cache) as spy:
+                second = self.get_follow()
+            render.assert_not_called()
+        spy.get_many.assert_called_once()
+        spy.set_many.assert_not_called()
+        self.assertEqual(first.content, second.content)
+
+    def test_edit_changes_card(self):
+        """Проверяем, что после правки поста выводится новая карточка."""
+        self.get_follow()
+        post = Post.objects.latest('id')
+        post.text = 'Исправленный пост'
+        post.save()
+        content = self.get_follow().content.decode()
+        self.assertIn('Исправленный пост', content)
+        self.assertNotIn('Тестовый пост 2', content)
+
+    def test_author_and_group_changes_cards(self):
+        """Проверяем, что смена имени автора и адреса группы меняет
+        карточки его постов и постов группы."""
+        self.get_follow()
+        author = User.objects.get(pk=CardCacheTests.author.pk)
+        author.first_name = 'Фёдор'
+        author.save()
+        group = Group.objects.get(pk=CardCacheTests.group.pk)
+        group.slug = 'new-slug'
+        group.save()
+        content = self.get_follow().content.decode()
+        self.assertIn('Фёдор Толстой', content)
+        self.assertNotIn('Лев Толстой', content)
+        self.assertIn(reverse('posts:group_list', args=('new-slug',)), content)
+
+    def test_user_save_without_name_change_keeps_cards(self):
+        """Проверяем, что сохранение пользователя без смены имени (смена
+        пароля, правка в админке) не сбрасывает ленты и карточки."""
+        generation = caching.generations(caching.INDEX)[caching.INDEX]
+        versions = list(Post.objects.values_list('version', flat=True))
+        author = User.objects.get(pk=CardCacheTests.author.pk)
+        author.set_password('new-password')
+        author.email = 'leo@example.com'
+        author.save()
+        self.assertEqual(
+            caching.generations(caching.INDEX)[caching.INDEX], generation
+        )
+        self.assertEqual(
+            list(Post.objects.values_list('version', flat=True)), versions
+        )
+
+    def test_variants_cached_separately(self):
+        """Проверяем, что профиль не берёт карточку ленты с автором."""
+        self.assertContains(self.get_follow(), 'Автор:')
+        response = self.client.get(
+            reverse('posts:profile', args=(CardCacheTests.author.username,))
+        )
+        self.assertContains(response, 'Тестовый пост 2')
+        self.assertNotContains(response, 'Автор:')
+        post = Post.objects.latest('id')
+        self.assertNotEqual(
+            cards.card_key(post, 'feed'), cards.card_key(post, 'author')
+        )
+
+    def test_placeholder_not_cached(self):
+        """Проверяем, что карточка с заглушкой вместо картинки не
+        попадает в кэш, а карточка без картинки попадает."""
+        Post.objects.filter(text='Тестовый пост 2').update(
+            image='posts/small.gif'
+        )
+        self.assertContains(self.get_follow(), 'Картинка готовится')
+        with_image = Post.objects.get(text='Тестовый пост 2')
+        without_image = Post.objects.get(text='Тестовый пост 1')
+        self.assertIsNone(cache.get(cards.card_key(with_image, 'feed')))
+        self.assertIsNotNone(cache.get(cards.card_key(without_image, 'feed')))
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+EXTRA_COMMENTS = 5
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+        )
+        for i in range(settings.COMMENTS_PER_PAGE + EXTRA_COMMENTS):
+            Comment.objects.create(
+                author=User.objects.create_user(username=f'reader{i}'),
+                post=cls.post,
+                text=f'Тестовый комментарий {i}',
+            )
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id}
+        )
+        cls.comments_url = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.id}
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_bounds_comments(self):
+        """Проверяем, что страница поста выводит одну порцию
+        комментариев, от новых к старым."""
+        response = self.guest_client.get(CommentPaginationTests.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertTrue(comments.has_next())
+        self.assertEqual(
+            list(comments),
+            list(Comment.objects.order_by('-created', '-id')[
+                :settings.COMMENTS_PER_PAGE
+            ]),
+        )
+        self.assertContains(response, CommentPaginationTests.comments_url)
+
+    def test_load_more_fragment(self):
+        """Проверяем, что фрагмент «Показать ещё» отдаёт оставшиеся
+        комментарии одним запросом без N+1."""
+        response = self.guest_client.get(CommentPaginationTests.detail_url)
+        cursor = response.context['comments'].next_cursor()
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(
+                CommentPaginationTests.comments_url, {'cursor': cursor}
+            )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        comments = response.context['comments']
+        self.assertEqual(len(comments), EXTRA_COMMENTS)
+        self.assertFalse(comments.has_next())
+        self.assertNotContains(response, '<html')
+
+    def test_load_more_unknown_post(self):
+        """Проверяем, что для несуществующего поста фрагмент даёт 404."""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,123 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTests.reader)
+
+    def test_pages_answer_not_modified(self):
+        """Проверяем, что страницы отдают валидаторы и отвечают 304
+        на совпадающие If-None-Match и If-Modified-Since."""
+        for url in ConditionalGetTests.urls:
+            for client in (self.guest_client, self.authorized_client):
+                with self.subTest(url=url, client=client):
+                    response = client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    response = client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                    self.assertEqual(response.status_code, 304)
+                    if not response.has_header('Last-Modified'):
+                        # Страница поста с формой для вошедшего.
+                        continue
+                    response = client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                    )
+                    self.assertEqual(response.status_code, 304)
+
+    def test_post_etag_follows_csrf_token(self):
+        """Проверяем, что после смены CSRF-токена страница поста с формой
+        отдаётся заново, а Last-Modified вошедшему не отдаётся."""
+        url = ConditionalGetTests.urls[3]
+        response = self.authorized_client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.authorized_client.force_login(ConditionalGetTests.reader)
+        self.authorized_client.cookies.pop('csrftoken')
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified_skips_page_queries(self):
+        """Проверяем, что ответ 304 не выполняет запросы страницы."""
+        url = ConditionalGetTests.urls[0]
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        url = ConditionalGetTests.urls[-1]
+        etag = self.guest_client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_etag(self):
+        """Проверяем, что новый пост, правка, комментарий и подписка
+        меняют ETag затронутых страниц."""
+        post = ConditionalGetTests.post
+        writes = (
+            lambda: Post.objects.create(
+                author=ConditionalGetTests.user,
+                text='Новый пост',
+                group=ConditionalGetTests.group,
+            ),
+            lambda: post.save(),
+            lambda: Comment.objects.create(
+                author=ConditionalGetTests.reader,
+                post=post,
+                text='Тестовый комментарий',
+            ),
+            lambda: Follow.objects.create(
+                user=ConditionalGetTests.reader,
+                author=ConditionalGetTests.user,
+            ),
+        )
+        urls = {
+            0: ConditionalGetTests.urls,
+            1: ConditionalGetTests.urls,
+            2: ConditionalGetTests.urls[-1:],
+            3: ConditionalGetTests.urls[2:],
+        }
+        for number, write in enumerate(writes):
+            etags = {
+                url: self.guest_client.get(url)['ETag']
+                for url in urls[number]
+            }
+            write()
+            for url, etag in etags.items():
+                with self.subTest(write=number, url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                    self.assertEqual(response.status_code, 200)
@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import counters
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        """Проверяем счётчики постов и комментариев."""
+        post = Post.objects.create(
+            author=CountersTests.user,
+            text='Тестовый пост',
+            group=CountersTests.group,
+        )
+        Comment.objects.create(
+            author=CountersTests.reader,
+            post=post,
+            text='Тестовый комментарий',
+        )
+        post.refresh_from_db()
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(self.stats(CountersTests.user).posts_count, 1)
+        self.assertEqual(CountersTests.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        post.group = None
+        post.save()
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(CountersTests.user).posts_count, 0)
+
+    def test_follow_counters(self):
+        """Проверяем счётчики подписчиков и подписок."""
+        follow = Follow.objects.create(
+            user=CountersTests.reader,
+            author=CountersTests.user,
+        )
+        self.assertEqual(self.stats(CountersTests.user).followers_count, 1)
+        self.assertEqual(self.stats(CountersTests.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.stats(CountersTests.user).followers_count, 0)
+        self.assertEqual(self.stats(CountersTests.reader).following_count, 0)
+
+    def test_check_counters_repairs_drift(self):
+        """Проверяем, что команда находит и исправляет расхождения."""
+        Post.objects.bulk_create([
+            Post(author=CountersTests.user, text='Без сигналов'),
+        ])
+        UserStats.objects.filter(user=CountersTests.reader).delete()
+        drift = list(counters.find_drift())
+        self.assertIn(
+            ('user', CountersTests.user.pk, 'posts_count', 0, 1), drift
+        )
+        call_command('check_counters', fix=True, stdout=StringIO())
+        self.assertEqual(list(counters.find_drift()), [])
+        self.assertEqual(self.stats(CountersTests.user).posts_count, 1)
+        self.assertTrue(
+            UserStats.objects.filter(user=CountersTests.reader).exists()
+        )
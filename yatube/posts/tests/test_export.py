@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+from posts.tests.test_storage import png
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(ExportTests.user)
+        self.url = reverse('posts:profile_export', args=('auth',))
+
+    def create_history(self):
+        posts = [
+            Post.objects.create(
+                author=ExportTests.user,
+                text=f'Пост {i}',
+                group=ExportTests.group if i % 2 else None,
+                image=png('same.png') if i < 2 else '',
+            )
+            for i in range(3)
+        ]
+        other_post = Post.objects.create(
+            author=ExportTests.other, text='Чужой'
+        )
+        Comment.objects.create(
+            author=ExportTests.user, post=other_post, text='Коммент'
+        )
+        return posts
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_jsonl_export(self):
+        """Проверяем, что JSONL содержит посты и комментарии автора."""
+        posts = self.create_history()
+        lines = self.content(self.client.get(self.url)).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [(record['type'], record['id']) for record in records],
+            [('post', post.id) for post in posts]
+            + [('comment', Comment.objects.get().id)],
+        )
+        self.assertEqual(records[1]['group'], ExportTests.group.slug)
+        self.assertEqual(records[0]['image'], posts[0].image.name)
+        self.assertEqual(records[-1]['post_author'], 'other')
+
+    def test_csv_export(self):
+        """Проверяем, что CSV начинается с заголовка и содержит
+        все записи."""
+        self.create_history()
+        response = self.client.get(self.url, {'format': 'csv'})
+        rows = list(csv.DictReader(
+            io.StringIO(self.content(response).decode())
+        ))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[-1]['text'], 'Коммент')
+        self.assertEqual(rows[2]['image'], '')
+
+    def test_zip_export_with_images(self):
+        """Проверяем, что архив содержит выгрузку и каждую картинку
+        один раз."""
+        posts = self.create_history()
+        response = self.client.get(self.url, {'images': 1})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(self.content(response)))
+        self.assertEqual(
+            archive.namelist(), ['posts.jsonl', posts[0].image.name]
+        )
+        with posts[0].image.open() as image:
+            self.assertEqual(
+                archive.read(posts[0].image.name), image.read()
+            )
+
+    def test_non_ascii_username_filename(self):
+        """Проверяем, что имя файла с кириллицей передаётся в filename*,
+        а в filename остаётся ASCII-запасное."""
+        user = User.objects.create_user(username='лев')
+        client = Client()
+        client.force_login(user)
+        response = client.get(reverse('posts:profile_export', args=('лев',)))
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="posts.jsonl"; '
+            "filename*=UTF-8''%D0%BB%D0%B5%D0%B2.jsonl",
+        )
+        self.assertEqual(
+            self.client.get(self.url)['Content-Disposition'],
+            'attachment; filename="auth.jsonl"; '
+            "filename*=UTF-8''auth.jsonl",
+        )
+
+    def test_export_permissions(self):
+        """Проверяем, что выгрузку получают автор и персонал."""
+        other = Client()
+        other.force_login(ExportTests.other)
+        staff = Client()
+        staff.force_login(ExportTests.staff)
+        self.assertEqual(other.get(self.url).status_code, 403)
+        self.assertEqual(staff.get(self.url).status_code, 200)
+        self.assertEqual(Client().get(self.url).status_code, 302)
+        response = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command(self):
+        """Проверяем, что команда пишет выгрузку в stdout и в файл."""
+        self.create_history()
+        out = io.StringIO()
+        call_command('export_posts', 'auth', '--format', 'csv', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+        path = os.path.join(TEMP_MEDIA_ROOT, 'export.zip')
+        call_command(
+            'export_posts', 'auth', '--images', '--output', path,
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(len(zipfile.ZipFile(path).namelist()), 2)
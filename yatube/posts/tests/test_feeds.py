@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.models import Group, Post, User
+from posts.tests.utils import QueryBudgetMixin
+
+
+@override_settings(FEED_POSTS=3)
+class FeedTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        for i in range(5):
+            Post.objects.create(
+                author=cls.user, text=f'Тестовый пост {i}', group=cls.group
+            )
+        cls.feeds = (
+            ('posts:index_rss', ()),
+            ('posts:index_atom', ()),
+            ('posts:group_rss', (cls.group.slug,)),
+            ('posts:group_atom', (cls.group.slug,)),
+            ('posts:profile_rss', (cls.user.username,)),
+            ('posts:profile_atom', (cls.user.username,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_show_latest_posts(self):
+        """Проверяем, что ленты содержат только последние посты,
+        Last-Modified — дату самого нового, и укладываются в бюджет
+        запросов."""
+        newest = Post.objects.order_by('-pub_date', '-id').first()
+        for url_name, args in FeedTests.feeds:
+            with self.subTest(url_name=url_name):
+                response = self.assertQueryBudget(
+                    self.client, url_name, *args
+                )
+                self.assertEqual(response.status_code, 200)
+                content = response.content.decode()
+                self.assertIn('Тестовый пост 4', content)
+                self.assertIn('Тестовый пост 2', content)
+                self.assertNotIn('Тестовый пост 1', content)
+                self.assertIn(
+                    reverse('posts:post_detail', args=(newest.id,)), content
+                )
+                self.assertEqual(
+                    response['Last-Modified'],
+                    http_date(newest.pub_date.timestamp()),
+                )
+        response = self.client.get(reverse('posts:group_rss', args=('no',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_cached_and_conditional(self):
+        """Проверяем, что повторный и условный запросы обходятся без базы."""
+        url = reverse('posts:group_rss', args=(FeedTests.group.slug,))
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, response.content)
+            self.assertEqual(self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code, 304)
+            self.assertEqual(self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            ).status_code, 304)
+
+    def test_new_post_invalidates_its_scope_only(self):
+        """Проверяем, что новый пост сбрасывает ленты своей группы,
+        но не чужой."""
+        group_url = reverse('posts:group_rss', args=(FeedTests.group.slug,))
+        index_url = reverse('posts:index_rss')
+        self.client.get(group_url)
+        self.client.get(index_url)
+        Post.objects.create(
+            author=FeedTests.user,
+            text='Пост в другой группе',
+            group=FeedTests.other_group,
+        )
+        with self.assertNumQueries(0):
+            self.client.get(group_url)
+        self.assertContains(self.client.get(index_url), 'Пост в другой группе')
+
+    def test_description_escaped(self):
+        """Проверяем, что текст поста в описании экранирован, а переносы
+        строк стали <br>."""
+        Post.objects.create(
+            author=FeedTests.user, text='<b>жирный</b> & ко\nвторая строка'
+        )
+        content = self.client.get(reverse('posts:index_rss')).content.decode()
+        self.assertIn(
+            '&amp;lt;b&amp;gt;жирный&amp;lt;/b&amp;gt; &amp;amp; ко'
+            '&lt;br&gt;вторая строка',
+            content,
+        )
+
+    def test_cache_keyed_on_host_and_scheme(self):
+        """Проверяем, что ссылки в ленте берутся из хоста и схемы
+        своего запроса, а не первого закэшированного."""
+        url = reverse('posts:index_rss')
+        self.client.get(url, HTTP_HOST='localhost')
+        content = self.client.get(
+            url, HTTP_HOST='127.0.0.1', secure=True
+        ).content.decode()
+        self.assertIn('https://127.0.0.1/', content)
+        self.assertNotIn('localhost', content)
@@ -0,0 +1,133 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts import following
+from posts.models import Follow, Post, User
+
+
+class FollowingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(FollowingTests.reader)
+
+    def fresh_reader(self):
+        return User.objects.get(pk=FollowingTests.reader.pk)
+
+    def test_followed_authors_array(self):
+        """Проверяем вхождение, вставку и удаление в отсортированном
+        массиве."""
+        followed = following.FollowedAuthors([7, 3, 5, 3])
+        self.assertEqual(list(followed), [3, 5, 7])
+        followed.add(4)
+        followed.add(4)
+        followed.discard(5)
+        followed.discard(6)
+        self.assertEqual(list(followed), [3, 4, 7])
+        self.assertIn(7, followed)
+        self.assertNotIn(5, followed)
+        self.assertEqual(followed.following([1, 3, None, 7]), {3, 7})
+
+    def test_anonymous_follows_nobody(self):
+        """Проверяем, что у анонима пустое множество подписок."""
+        response = Client().get(reverse(
+            'posts:profile', args=(FollowingTests.authors[0].username,)
+        ))
+        self.assertFalse(response.context['following'])
+
+    def test_follow_ignores_stale_cache(self):
+        """Проверяем, что подписка создаётся, даже если кэш уже считает
+        читателя подписанным."""
+        author = FollowingTests.authors[1]
+        following._store(
+            FollowingTests.reader.pk, following.FollowedAuthors([author.pk])
+        )
+        self.client.get(
+            reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assertTrue(Follow.objects.filter(
+            user=FollowingTests.reader, author=author
+        ).exists())
+
+    def test_search_marks_followed_authors(self):
+        """Проверяем, что страница поиска отмечает авторов, на которых
+        подписан читатель."""
+        first, second, _ = FollowingTests.authors
+        Follow.objects.create(user=FollowingTests.reader, author=first)
+        for author in (first, second):
+            Post.objects.create(author=author, text='Тестовый пост')
+        response = self.client.get(reverse('posts:search'), {'q': 'пост'})
+        self.assertContains(response, 'Вы подписаны на автора', count=1)
+
+
+class FollowingCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def fresh_reader(self):
+        return User.objects.get(pk=self.reader.pk)
+
+    def test_loaded_once_and_dropped_on_commit(self):
+        """Проверяем, что множество читается из базы один раз, а после
+        подписки и отписки перечитывается."""
+        first, second, third = self.authors
+        Follow.objects.create(user=self.reader, author=first)
+        reader = self.fresh_reader()
+        with self.assertNumQueries(1):
+            followed = following.followed_authors(reader)
+        self.assertEqual(list(followed), [first.id])
+        reader = self.fresh_reader()
+        with self.assertNumQueries(0):
+            following.followed_authors(reader)
+        Follow.objects.create(user=self.reader, author=third)
+        Follow.objects.create(user=self.reader, author=second)
+        Follow.objects.filter(author=first).delete()
+        reader = self.fresh_reader()
+        with self.assertNumQueries(1):
+            followed = following.followed_authors(reader)
+        self.assertEqual(list(followed), [second.id, third.id])
+
+    def test_rollback_keeps_cached_set(self):
+        """Проверяем, что откаченная подписка не меняет множество
+        в кэше."""
+        first, second, _ = self.authors
+        Follow.objects.create(user=self.reader, author=first)
+        following.followed_authors(self.fresh_reader())
+        with transaction.atomic():
+            Follow.objects.create(user=self.reader, author=second)
+            transaction.set_rollback(True)
+        reader = self.fresh_reader()
+        with self.assertNumQueries(0):
+            followed = following.followed_authors(reader)
+        self.assertEqual(list(followed), [first.id])
+
+    def test_profile_and_follow_views_use_cache(self):
+        """Проверяем, что профиль и подписка пользуются множеством
+        и видят изменения."""
+        author = self.authors[0]
+        profile = reverse('posts:profile', args=(author.username,))
+        self.assertFalse(self.client.get(profile).context['following'])
+        self.client.get(
+            reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assertTrue(self.client.get(profile).context['following'])
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(author.username,))
+        )
+        self.assertFalse(self.client.get(profile).context['following'])
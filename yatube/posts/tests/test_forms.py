@@ -10,6 +10,8 @@ from django.urls import reverse
 from ..models import Post, Group, User, Comment
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Картинки хранятся под SHA-256 своего содержимого.
+HASHED_GIF = r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$'
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -77,7 +79,7 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 text=form['text'],
                 group=form['group'],
-                image='posts/' + uploaded.name,
+                image__regex=HASHED_GIF,
             ).exists()
         )
 
@@ -119,7 +121,7 @@ class PostFormTests(TestCase):
                 id=self.post.id,
                 text=form['text'],
                 group=form['group'],
-                image='posts/' + uploaded_2.name,
+                image__regex=HASHED_GIF,
             ).exists()
         )
 
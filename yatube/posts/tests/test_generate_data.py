@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from posts import counters
+from posts.models import Comment, Follow, Group, Post, Timeline, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL = {
+    'users': 30,
+    'groups': 3,
+    'posts': 200,
+    'follows': 5,
+    'comments': 100,
+    'hot_posts': 2,
+    'hot_comments': 20,
+    'images': 0.5,
+    'image_pool': 2,
+    'batch_size': 50,
+    'seed': 7,
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDataTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, **options):
+        call_command('generate_data', stdout=StringIO(), **SMALL, **options)
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('id').values_list(
+                'text', 'author__username', 'group__slug', 'image'
+            )),
+            list(Follow.objects.order_by('id').values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def test_generates_consistent_data(self):
+        """Проверяем, что команда создаёт данные с верными счётчиками
+        и лентами подписок."""
+        self.generate(timelines=True)
+        self.assertEqual(User.objects.count(), SMALL['users'])
+        self.assertEqual(Group.objects.count(), SMALL['groups'])
+        self.assertEqual(Post.objects.count(), SMALL['posts'])
+        self.assertEqual(
+            Comment.objects.count(),
+            SMALL['comments'] + SMALL['hot_posts'] * SMALL['hot_comments'],
+        )
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(Timeline.objects.exists())
+        self.assertEqual(list(counters.find_drift()), [])
+
+    def test_same_seed_same_data(self):
+        """Проверяем, что одинаковый seed даёт одинаковые данные."""
+        snapshots = []
+        for _ in range(2):
+            with transaction.atomic():
+                self.generate()
+                snapshots.append(self.snapshot())
+                transaction.set_rollback(True)
+        self.assertEqual(snapshots[0], snapshots[1])
@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+from unittest import mock
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import caching, export, importer, search, timeline
+from posts.importer import Importer
+from posts.models import (
+    Comment, Follow, Group, Post, Timeline, User, UserStats,
+)
+
+OLD = datetime(2015, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def lines(*records):
+    return [json.dumps(record) + '\n' for record in records]
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def source(self):
+        return lines(
+            {'type': 'post', 'id': 10, 'author': 'auth',
+             'created': OLD.isoformat(), 'text': 'Старый пост про котов',
+             'group': 'test-slug'},
+            {'type': 'post', 'id': 11, 'author': 'auth',
+             'created': '2016-01-01T00:00:00', 'text': 'Второй пост'},
+            {'type': 'comment', 'author': 'reader', 'post': 10,
+             'created': '2015-03-02T08:00:00+00:00', 'text': 'Коммент'},
+        )
+
+    def test_import_keeps_dates_and_links(self):
+        """Проверяем, что импорт сохраняет даты источника и связывает
+        комментарии с новыми постами."""
+        importer = Importer(batch_size=1)
+        importer.run(self.source())
+        self.assertEqual(importer.imported['posts'], 2)
+        self.assertEqual(importer.imported['comments'], 1)
+        post = Post.objects.get(text='Старый пост про котов')
+        self.assertEqual(post.pub_date, OLD)
+        self.assertEqual(post.group, ImportTests.group)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, post)
+        self.assertEqual(comment.author, ImportTests.reader)
+        self.assertEqual(
+            comment.created,
+            datetime(2015, 3, 2, 8, 0, tzinfo=timezone.utc),
+        )
+        # Поле снова заполняется автоматически.
+        fresh = Post.objects.create(author=ImportTests.user, text='Новый')
+        self.assertGreater(fresh.pub_date, OLD)
+
+    def test_derived_data_updated_at_the_end(self):
+        """Проверяем, что после импорта верны счётчики, ленты подписок,
+        поколения кэша и поисковый индекс."""
+        generation = caching.generations(caching.INDEX)[caching.INDEX]
+        Importer().run(self.source())
+        post = Post.objects.get(text='Старый пост про котов')
+        ImportTests.user.stats.refresh_from_db()
+        ImportTests.group.refresh_from_db()
+        self.assertEqual(ImportTests.user.stats.posts_count, 2)
+        self.assertEqual(ImportTests.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            Timeline.objects.filter(user=ImportTests.reader).count(), 2
+        )
+        self.assertNotEqual(
+            caching.generations(caching.INDEX)[caching.INDEX], generation
+        )
+        results = search.search('котов')
+        self.assertEqual(list(results[:results.count()]), [post])
+
+    def test_ids_from_database_and_only_touched_recounted(self):
+        """Проверяем, что id постов назначает база, комментарии пачки
+        ссылаются на них, а пересчитываются только затронутые строки."""
+        other = User.objects.create_user(username='other')
+        existing = Post.objects.create(author=other, text='Был')
+        UserStats.objects.filter(user=other).update(posts_count=7)
+        Importer(batch_size=10).run(self.source())
+        posts = Post.objects.filter(author=ImportTests.user)
+        self.assertTrue(all(post.id > existing.id for post in posts))
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post.text, 'Старый пост про котов')
+        self.assertEqual(comment.post.comments_count, 1)
+        self.assertEqual(UserStats.objects.get(user=other).posts_count, 7)
+        self.assertEqual(
+            UserStats.objects.get(user=ImportTests.user).posts_count, 2
+        )
+
+    def test_only_imported_posts_distributed_in_batches(self):
+        """Проверяем, что в ленты подписчиков пачками добавляются только
+        импортированные посты, а сами ленты не пересобираются."""
+        earlier = Post.objects.create(author=ImportTests.user, text='Был')
+        Timeline.objects.filter(post=earlier).delete()
+        with mock.patch.object(importer, 'LOOKUP_BATCH', 1), \
+                mock.patch.object(timeline, 'distribute_posts',
+                                  wraps=timeline.distribute_posts) as spy:
+            Importer().run(self.source())
+        self.assertEqual(spy.call_count, 2)
+        self.assertEqual(
+            sorted(
+                Timeline.objects.filter(user=ImportTests.reader)
+                .values_list('post__text', flat=True)
+            ),
+            ['Второй пост', 'Старый пост про котов'],
+        )
+
+    def test_unknown_references_skipped_or_created(self):
+        """Проверяем, что записи неизвестных авторов и групп пропускаются,
+        а с create_missing авторы и группы создаются."""
+        records = lines(
+            {'type': 'post', 'id': 1, 'author': 'ghost',
+             'created': OLD.isoformat(), 'text': 'Пост', 'group': 'new'},
+            {'type': 'comment', 'author': 'auth', 'post': 1,
+             'created': OLD.isoformat(), 'text': 'Коммент'},
+            {'type': 'post', 'author': 'auth', 'created': 'вчера'},
+        ) + ['не json\n']
+        importer = Importer()
+        importer.run(records)
+        self.assertEqual(dict(importer.skipped), {
+            'unknown_author': 1, 'unknown_post': 1, 'bad_date': 1,
+            'bad_json': 1,
+        })
+        importer = Importer(create_missing=True)
+        importer.run(records)
+        self.assertEqual(importer.imported['posts'], 1)
+        self.assertEqual(importer.imported['comments'], 1)
+        ghost = User.objects.get(username='ghost')
+        self.assertFalse(ghost.has_usable_password())
+        self.assertEqual(ghost.stats.posts_count, 1)
+        self.assertTrue(Group.objects.filter(slug='new').exists())
+
+    def test_export_round_trip(self):
+        """Проверяем, что выгрузка export_posts загружается обратно
+        командой import_posts."""
+        Importer().run(self.source())
+        dump = b''.join(export.stream(ImportTests.user, 'jsonl')).decode()
+        expected = list(
+            Post.objects.filter(author=ImportTests.user)
+            .order_by('pub_date').values_list('text', 'pub_date')
+        )
+        Post.objects.all().delete()
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as target:
+                target.write(dump)
+            out = StringIO()
+            call_command('import_posts', path, stdout=out)
+        finally:
+            os.remove(path)
+        self.assertIn('Импортировано постов: 2', out.getvalue())
+        self.assertEqual(
+            list(
+                Post.objects.order_by('pub_date')
+                .values_list('text', 'pub_date')
+            ),
+            expected,
+        )
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.middleware import CACHE_HEADER
+from posts.models import Group, Post, User
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(AnonymousPageCacheTests.user)
+
+    def test_anonymous_pages_cached_until_post_write(self):
+        """Проверяем, что анонимный читатель получает страницу из кэша,
+        пока в ленту не добавлен пост"""
+        for url in AnonymousPageCacheTests.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response[CACHE_HEADER], 'MISS')
+                response = self.guest_client.get(url)
+                self.assertEqual(response[CACHE_HEADER], 'HIT')
+                response = self.guest_client.get(url, {'page': 2})
+                self.assertEqual(response[CACHE_HEADER], 'MISS')
+                post = Post.objects.create(
+                    author=AnonymousPageCacheTests.user,
+                    text=f'Новый пост {url}',
+                    group=AnonymousPageCacheTests.group,
+                )
+                response = self.guest_client.get(url)
+                self.assertEqual(response[CACHE_HEADER], 'MISS')
+                self.assertContains(response, post.text)
+
+    def test_authorized_pages_bypass_cache(self):
+        """Проверяем, что страницы для авторизованных не кэшируются."""
+        for url in AnonymousPageCacheTests.urls:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                response = self.authorized_client.get(url)
+                self.assertNotIn(CACHE_HEADER, response)
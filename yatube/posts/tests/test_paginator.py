@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.templatetags.user_filters import PAGE_WINDOW
+from posts.models import Post, User
+from posts.utils import CursorPaginator, decode_cursor
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.NUM_ADD_POSTS = 5
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Тестовый пост {i}')
+            for i in range(settings.POSTS_PER_PAGE * 2 + cls.NUM_ADD_POSTS)
+        ])
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        self.client = Client()
+        self.paginator = CursorPaginator(
+            Post.objects.all(), settings.POSTS_PER_PAGE
+        )
+
+    def test_walk_forward_and_back(self):
+        """Проверяем, что курсор проходит ленту вперёд и назад
+        без пропусков и повторов."""
+        first = self.paginator.get_page(None)
+        self.assertFalse(first.has_previous())
+        second = self.paginator.get_page(first.next_cursor())
+        third = self.paginator.get_page(second.next_cursor())
+        self.assertFalse(third.has_next())
+        self.assertEqual(
+            list(first) + list(second) + list(third),
+            CursorPaginatorTests.ordered
+        )
+        self.assertEqual(len(third), CursorPaginatorTests.NUM_ADD_POSTS)
+        back = self.paginator.get_page(third.previous_cursor())
+        self.assertEqual(list(back), list(second))
+        back = self.paginator.get_page(back.previous_cursor())
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Проверяем, что битый токен открывает первую страницу."""
+        self.assertIsNone(decode_cursor('не-курсор'))
+        page = self.paginator.get_page('не-курсор')
+        self.assertEqual(
+            list(page),
+            CursorPaginatorTests.ordered[:settings.POSTS_PER_PAGE]
+        )
+
+    @override_settings(CURSOR_PAGINATION_VIEWS=('posts:profile',))
+    def test_cursor_mode_switched_per_view(self):
+        """Проверяем, что курсорный режим включается для отдельной view."""
+        url = reverse(
+            'posts:profile',
+            kwargs={'username': CursorPaginatorTests.user.username}
+        )
+        response = self.client.get(url)
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj.paginator, CursorPaginator)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor()}')
+        response = self.client.get(url, {'cursor': page_obj.next_cursor()})
+        self.assertEqual(
+            list(response.context['page_obj']),
+            CursorPaginatorTests.ordered[
+                settings.POSTS_PER_PAGE:settings.POSTS_PER_PAGE * 2
+            ]
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIsInstance(
+            response.context['page_obj'].paginator, CursorPaginator
+        )
+
+
+class PageWindowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Тестовый пост {i}')
+            for i in range(settings.POSTS_PER_PAGE * (PAGE_WINDOW * 4))
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_links_limited_to_window(self):
+        """Проверяем, что выводятся ссылки только на соседние страницы."""
+        page = PAGE_WINDOW * 2
+        response = self.client.get(reverse('posts:index'), {'page': page})
+        self.assertContains(response, f'?page={page - PAGE_WINDOW}"')
+        self.assertContains(response, f'?page={page + PAGE_WINDOW}"')
+        self.assertNotContains(response, f'?page={page - PAGE_WINDOW - 1}"')
+        self.assertNotContains(response, f'?page={page + PAGE_WINDOW + 1}"')
+        self.assertContains(response, f'?page={PAGE_WINDOW * 4}"')
@@ -0,0 +1,179 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.queries import fingerprint
+from posts.tests.utils import QueryBudgetMixin
+from posts.utils import CURSOR_PARAM
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for i in range(settings.POSTS_PER_PAGE):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {i}',
+                group=cls.group,
+            )
+        # Бюджеты учитывают и чтение метаданных миниатюр.
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост с картинкой',
+            group=cls.group,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        for i in range(settings.QUERY_REPEAT_THRESHOLD + 1):
+            Comment.objects.create(
+                author=User.objects.create_user(username=f'commenter{i}'),
+                post=cls.post,
+                text=f'Тестовый комментарий {i}',
+            )
+        cls.pages = (
+            ('posts:index',),
+            ('posts:group_list', cls.group.slug),
+            ('posts:profile', cls.user.username),
+            ('posts:post_detail', cls.post.id),
+            ('posts:post_comments', cls.post.id),
+            ('posts:post_create',),
+            ('posts:post_edit', cls.post.id),
+            ('posts:follow_index',),
+            ('posts:api_index',),
+            ('posts:api_group_list', cls.group.slug),
+            ('posts:api_profile', cls.user.username),
+            ('posts:api_follow_index',),
+            ('posts:index_rss',),
+            ('posts:index_atom',),
+            ('posts:group_rss', cls.group.slug),
+            ('posts:group_atom', cls.group.slug),
+            ('posts:profile_rss', cls.user.username),
+            ('posts:profile_atom', cls.user.username),
+        )
+        cls.feeds = (
+            ('posts:index',),
+            ('posts:group_list', cls.group.slug),
+            ('posts:profile', cls.user.username),
+            ('posts:follow_index',),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(QueryBudgetTests.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryBudgetTests.reader)
+
+    def test_views_fit_query_budget(self):
+        """Проверяем, что view укладываются в бюджет запросов
+        и не делают повторяющихся запросов."""
+        for url_name, *args in QueryBudgetTests.pages:
+            for client in (self.author_client, self.reader_client):
+                with self.subTest(url_name=url_name, client=client):
+                    cache.clear()
+                    self.assertQueryBudget(client, url_name, *args)
+                    cache.clear()
+                    self.assertQueryBudget(
+                        client, url_name, *args, data={'page': 2}
+                    )
+
+    def test_search_fits_query_budget(self):
+        """Проверяем, что поиск укладывается в бюджет запросов."""
+        for client in (self.author_client, self.reader_client):
+            for data in ({'q': 'пост'}, {'q': 'пост', 'page': 2}):
+                with self.subTest(client=client, data=data):
+                    cache.clear()
+                    self.assertQueryBudget(client, 'posts:search', data=data)
+
+    @override_settings(CURSOR_PAGINATION_VIEWS=(
+        'posts:index', 'posts:group_list', 'posts:profile',
+        'posts:follow_index',
+    ))
+    def test_cursor_feeds_fit_query_budget(self):
+        """Проверяем, что ленты в режиме курсора укладываются в бюджет
+        запросов на первой и следующей странице."""
+        clients = (self.author_client, self.reader_client)
+        for url_name, *args in QueryBudgetTests.feeds:
+            for client in clients:
+                with self.subTest(url_name=url_name, client=client):
+                    cache.clear()
+                    response = self.assertQueryBudget(
+                        client, url_name, *args
+                    )
+                    cursor = response.context['page_obj'].next_cursor()
+                    if cursor is None:
+                        continue
+                    cache.clear()
+                    response = self.assertQueryBudget(
+                        client, url_name, *args,
+                        data={CURSOR_PARAM: cursor},
+                    )
+                    page_obj = response.context['page_obj']
+                    cache.clear()
+                    self.assertQueryBudget(
+                        client, url_name, *args,
+                        data={CURSOR_PARAM: page_obj.previous_cursor()},
+                    )
+
+    def test_fingerprint_ignores_values(self):
+        """Проверяем, что отпечаток не зависит от значений в запросе."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 10'),
+            fingerprint('SELECT *  FROM t WHERE id IN (%s)\nLIMIT 21'),
+        )
+
+    @override_settings(
+        QUERY_BUDGET_ENABLED=True,
+        QUERY_BUDGETS={'posts:index': 0},
+        QUERY_REPEAT_THRESHOLD=1,
+    )
+    def test_middleware_reports_queries(self):
+        """Проверяем, что middleware пишет Server-Timing и предупреждает
+        о превышении бюджета и повторах."""
+        cache.clear()
+        client = Client()
+        with self.assertLogs('posts.queries', 'WARNING') as logs:
+            response = client.get(reverse('posts:index'))
+        self.assertIn('Server-Timing', response)
+        self.assertTrue(any('бюджете 0' in line for line in logs.output))
+        self.assertTrue(any('N+1' in line for line in logs.output))
+
+    @override_settings(
+        QUERY_BUDGET_ENABLED=True,
+        QUERY_BUDGETS={'posts:post_create': 0},
+    )
+    def test_middleware_skips_form_posts(self):
+        """Проверяем, что отправка формы не сверяется с бюджетом."""
+        with self.assertNoLogs('posts.queries', 'WARNING'):
+            response = self.author_client.post(
+                reverse('posts:post_create'), {'text': 'Новый пост'}
+            )
+        self.assertIn('Server-Timing', response)
@@ -0,0 +1,125 @@
+import re
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+FEED_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:follow_index',
+)
+# Полный проход таблицы без индекса: «SCAN posts_post» или
+# «SCAN TABLE posts_post» в старых версиях SQLite.
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\S+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Форма поста выводит все группы списком — полный проход здесь ожидаем.
+ALLOWED_SCANS = ('SCAN posts_group', 'SCAN TABLE posts_group')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        for i in range(settings.POSTS_PER_PAGE + 1):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {i}',
+                group=cls.group,
+            )
+        Comment.objects.create(
+            author=cls.reader,
+            post=cls.post,
+            text='Тестовый комментарий',
+        )
+        cls.urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': cls.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': cls.user.username}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': cls.post.id}
+            ),
+            'posts:post_edit': reverse(
+                'posts:post_edit', kwargs={'post_id': cls.post.id}
+            ),
+            'posts:post_create': reverse('posts:post_create'),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(QueryPlanTests.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryPlanTests.reader)
+
+    def capture(self, client, url, data=None):
+        queries = []
+
+        def collect(execute, sql, params, many, context):
+            if sql.startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(collect):
+            response = client.get(url, data)
+        return response, queries
+
+    def plan(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, client, url, data=None):
+        response, queries = self.capture(client, url, data)
+        for sql, params in queries:
+            for step in self.plan(sql, params):
+                with self.subTest(url=url, sql=sql, step=step):
+                    if step not in ALLOWED_SCANS:
+                        self.assertIsNone(FULL_SCAN.match(step))
+                    self.assertNotIn(TEMP_SORT, step)
+        return response
+
+    def test_views_use_indexes(self):
+        """Проверяем, что запросы всех view идут по индексам
+        и не сортируются во временном B-дереве."""
+        for name, url in QueryPlanTests.urls.items():
+            client = self.client
+            if name == 'posts:follow_index':
+                client = self.reader_client
+            self.assert_indexed(client, url)
+            self.assert_indexed(client, url, {'page': 2})
+
+    @override_settings(CURSOR_PAGINATION_VIEWS=FEED_VIEWS)
+    def test_cursor_feeds_use_indexes(self):
+        """Проверяем планы курсорных лент, включая переход по курсору."""
+        for name in FEED_VIEWS:
+            client = self.client
+            if name == 'posts:follow_index':
+                client = self.reader_client
+            url = QueryPlanTests.urls[name]
+            response = self.assert_indexed(client, url)
+            page_obj = response.context['page_obj']
+            self.assert_indexed(client, url, {
+                'cursor': page_obj.next_cursor()
+            })
+            self.assert_indexed(client, url, {
+                'cursor': page_obj.paginator.make_cursor('p', page_obj[-1])
+            })
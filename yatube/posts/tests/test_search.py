@@ -0,0 +1,134 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Group, Post, User
+from posts.tests.utils import QueryBudgetMixin
+
+
+def found(query):
+    results = search.search(query)
+    return [post.id for post in results[:results.count()]]
+
+
+class SearchTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Кошки',
+            slug='cats',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Рыжий кот спит на подоконнике',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_index_available(self):
+        """Проверяем, что миграции создали индекс FTS5."""
+        self.assertTrue(search.available())
+
+    def test_finds_text_group_and_author(self):
+        """Проверяем поиск по тексту, группе, имени автора и по началу
+        слова."""
+        post_id = SearchTests.post.id
+        for query in ('кот', 'подоконник', 'кошки', 'толстой', 'auth',
+                      'РЫЖИЙ кот'):
+            with self.subTest(query=query):
+                self.assertEqual(found(query), [post_id])
+        for query in ('собака', 'кот собака', '', '  "*) OR (', 'NEAR'):
+            with self.subTest(query=query):
+                self.assertEqual(found(query), [])
+
+    def test_results_ranked(self):
+        """Проверяем, что совпадение в тексте поста выше совпадения
+        в названии группы."""
+        other = Post.objects.create(
+            author=SearchTests.user, text='Про кошки и собак'
+        )
+        self.assertEqual(found('кошки'), [other.id, SearchTests.post.id])
+
+    def test_index_follows_changes(self):
+        """Проверяем, что индекс следует за правкой поста, переименованием
+        группы и автора и удалением поста."""
+        post = Post.objects.get(pk=SearchTests.post.pk)
+        post.text = 'Пёс охраняет двор'
+        post.save()
+        self.assertEqual(found('кот'), [])
+        self.assertEqual(found('пёс'), [post.id])
+        Group.objects.filter(pk=SearchTests.group.pk).update(title='Питомцы')
+        self.assertEqual(found('кошки'), [])
+        self.assertEqual(found('питомцы'), [post.id])
+        User.objects.filter(pk=SearchTests.user.pk).update(last_name='Чехов')
+        self.assertEqual(found('чехов'), [post.id])
+        post.delete()
+        self.assertEqual(found('пёс'), [])
+
+    def test_raw_insert_indexed(self):
+        """Проверяем, что в индекс попадают посты, вставленные мимо
+        ORM."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO posts_post '
+                '(text, pub_date, updated, author_id, image, comments_count,'
+                ' version)'
+                " VALUES ('Сырой попугай', %s, %s, %s, '', 0, 1)",
+                ['2021-01-01', '2021-01-01', SearchTests.user.id],
+            )
+        self.assertEqual(len(found('попугай')), 1)
+
+    def test_search_page_paginated(self):
+        """Проверяем, что страница поиска листается и ссылки на страницы
+        сохраняют запрос."""
+        Post.objects.bulk_create(
+            Post(author=SearchTests.user, text=f'Кот номер {i}')
+            for i in range(settings.POSTS_PER_PAGE)
+        )
+        url = reverse('posts:search')
+        response = self.client.get(url, {'q': 'кот'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, settings.POSTS_PER_PAGE + 1)
+        self.assertEqual(len(page_obj), settings.POSTS_PER_PAGE)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82&amp;page=2')
+        response = self.client.get(url, {'q': 'кот', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 1)
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_search_fits_query_budget(self):
+        """Проверяем, что поиск укладывается в бюджет запросов."""
+        self.assertQueryBudget(self.client, 'posts:search', data={'q': 'кот'})
+
+    def test_rebuild_command(self):
+        """Проверяем, что команда пересобирает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(found('кот'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('постов: 1', out.getvalue())
+        self.assertEqual(found('кот'), [SearchTests.post.id])
+
+
+class SearchMigrationTests(TransactionTestCase):
+    def test_migrations_rebuild_post_table(self):
+        """Проверяем, что триггеры индекса не мешают миграциям,
+        пересоздающим таблицу постов, и ставятся заново после них."""
+        call_command('migrate', 'posts', '0018', verbosity=0)
+        call_command('migrate', 'posts', verbosity=0)
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Рыжий кот')
+        self.assertEqual(found('кот'), [post.id])
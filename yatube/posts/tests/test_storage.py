@@ -0,0 +1,139 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+
+from posts import counters, thumbnails
+from posts.models import ImageBlob, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Настоящий generate: в ImageDeletionTests он подменён.
+generate_thumbnails = thumbnails.generate
+
+
+def png(name, color=(200, 40, 40)):
+    content = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
+
+
+def refs(name):
+    return (
+        ImageBlob.objects.filter(name=name)
+        .values_list('refs', flat=True)
+        .first()
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, image):
+        return Post.objects.create(
+            author=ContentAddressedStorageTests.user,
+            text='Тестовый пост',
+            image=image,
+        )
+
+    def test_same_content_stored_once(self):
+        """Проверяем, что одинаковые картинки хранятся одним файлом
+        с числом ссылок, а разные — разными."""
+        first = self.create(png('first.png'))
+        second = self.create(png('second.png'))
+        other = self.create(png('other.png', color=(0, 0, 0)))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.png$'
+        )
+        self.assertTrue(first.image.storage.exists(first.image.name))
+        self.assertEqual(refs(first.image.name), 2)
+        self.assertEqual(refs(other.image.name), 1)
+
+    def test_refs_follow_edit_and_delete(self):
+        """Проверяем, что число ссылок меняется при замене картинки
+        и удалении поста."""
+        first = self.create(png('first.png'))
+        second = self.create(png('second.png'))
+        name = first.image.name
+        second.image = png('other.png', color=(0, 0, 0))
+        second.save()
+        self.assertEqual(refs(name), 1)
+        self.assertEqual(refs(second.image.name), 1)
+        second.text = 'Другой текст'
+        second.save()
+        self.assertEqual(refs(second.image.name), 1)
+        first.delete()
+        self.assertIsNone(refs(name))
+
+    def test_check_counters_repairs_refs(self):
+        """Проверяем, что расхождение числа ссылок находится
+        и исправляется."""
+        post = self.create(png('first.png'))
+        ImageBlob.objects.filter(name=post.image.name).update(refs=5)
+        drift = list(counters.find_drift())
+        self.assertEqual(drift, [('image', post.image.name, 'refs', 5, 1)])
+        counters.repair(drift)
+        self.assertEqual(list(counters.find_drift()), [])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+@mock.patch.object(thumbnails, 'generate')
+class ImageDeletionTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_file_deleted_with_last_reference(self, generate):
+        """Проверяем, что файл удаляется только вместе с последним
+        ссылающимся на него постом."""
+        author = User.objects.create_user(username='auth')
+        first, second = (
+            Post.objects.create(
+                author=author, text='Пост', image=png(f'{number}.png')
+            )
+            for number in range(2)
+        )
+        storage, name = first.image.storage, first.image.name
+        first.delete()
+        self.assertTrue(storage.exists(name))
+        second.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_thumbnails_deleted_with_file(self, generate):
+        """Проверяем, что вместе с файлом удаляются и его миниатюры."""
+        author = User.objects.create_user(username='auth')
+        post = Post.objects.create(
+            author=author, text='Пост', image=png('thumbnails.png')
+        )
+        # Image.ANTIALIAS нужен sorl-thumbnail 12.7 и отсутствует
+        # в Pillow новее закреплённого в requirements.txt.
+        with mock.patch.object(
+            Image, 'ANTIALIAS', Image.LANCZOS, create=True
+        ):
+            generate_thumbnails(post.image.name)
+        ready = thumbnails.prefetch([post.image])[post.image.name]
+        names = [thumbnail.name for thumbnail in ready.values()]
+        for name in names:
+            self.assertTrue(default.storage.exists(name))
+        post.delete()
+        for name in names:
+            with self.subTest(name=name):
+                self.assertFalse(default.storage.exists(name))
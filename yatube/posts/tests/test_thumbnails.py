@@ -0,0 +1,315 @@
+import hashlib
+import io
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.kvstore import KVStore
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+PLACEHOLDER = 'Картинка готовится'
+
+
+def register(image, formats=None):
+    """Регистрирует варианты миниатюр так же, как это делает фоновый
+    поток; возвращает {(ширина, формат): миниатюра}."""
+    registered = {}
+    for variant in thumbnails.variants():
+        if formats is not None and variant.format not in formats:
+            continue
+        thumbnail = thumbnails.thumbnail_file(
+            thumbnails.source(image.name), variant.geometry, variant.options
+        )
+        thumbnail.set_size((variant.width, variant.height))
+        default.kvstore.set(thumbnail)
+        registered[variant.width, variant.format] = thumbnail
+    return registered
+
+
+def kvstore_queries(queries):
+    return [
+        query for query in queries
+        if 'thumbnail_kvstore' in query['sql']
+    ]
+
+
+def png(name):
+    # Цвет зависит от имени: одинаковые файлы хранилище сохранило бы
+    # одним файлом с общими миниатюрами.
+    color = tuple(hashlib.md5(name.encode()).digest()[:3])
+    content = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            image=png('thumbnails.png'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear()
+        self.guest_client = Client()
+        self.urls = (
+            reverse('posts:index'),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': ThumbnailTests.post.id},
+            ),
+        )
+
+    def test_placeholder_until_ready(self):
+        """Проверяем, что до готовности миниатюры выводится заглушка
+        и миниатюра не создаётся в запросе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, PLACEHOLDER)
+        self.assertIsNone(thumbnails.picture(ThumbnailTests.post.image))
+
+    def test_picture_rendered(self):
+        """Проверяем, что готовые варианты выводятся через srcset
+        с размерами наибольшего варианта."""
+        registered = register(ThumbnailTests.post.image)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotContains(response, PLACEHOLDER)
+                self.assertContains(response, 'type="image/webp"')
+                self.assertContains(response, 'width="960"')
+                self.assertContains(response, 'height="339"')
+                self.assertContains(
+                    response, f'src="{registered[960, "JPEG"].url}"'
+                )
+                for (width, _), thumbnail in registered.items():
+                    self.assertContains(
+                        response, f'{thumbnail.url} {width}w'
+                    )
+
+    def test_picture_needs_fallback_format(self):
+        """Проверяем, что без вариантов запасного формата выводится
+        заглушка."""
+        register(ThumbnailTests.post.image, formats=('WEBP',))
+        self.assertIsNone(thumbnails.picture(ThumbnailTests.post.image))
+        response = self.guest_client.get(self.urls[0])
+        self.assertContains(response, PLACEHOLDER)
+
+    def test_generated_thumbnails_found(self):
+        """Проверяем, что созданные generate() миниатюры находит
+        prefetch() и они выводятся вместо заглушки."""
+        image = ThumbnailTests.post.image
+        # sorl-thumbnail 12.7 масштабирует с Image.ANTIALIAS, которого нет
+        # в Pillow новее закреплённого в requirements.txt; это тот же
+        # фильтр, что и LANCZOS.
+        with mock.patch.object(
+            Image, 'ANTIALIAS', Image.LANCZOS, create=True
+        ):
+            thumbnails.generate(image.name)
+        ready = thumbnails.prefetch([image])[image.name]
+        self.assertEqual(set(ready), set(thumbnails.variants()))
+        for variant, thumbnail in ready.items():
+            with self.subTest(variant=variant):
+                self.assertIsNotNone(thumbnail)
+                self.assertTrue(thumbnail.exists())
+        response = self.guest_client.get(self.urls[0])
+        self.assertNotContains(response, PLACEHOLDER)
+
+    def test_picture_variants(self):
+        """Проверяем srcset и размеры Picture."""
+        registered = register(ThumbnailTests.post.image)
+        picture = thumbnails.picture(ThumbnailTests.post.image)
+        self.assertEqual((picture.width, picture.height), (960, 339))
+        self.assertEqual(picture.sizes, settings.POST_IMAGE_SIZES)
+        self.assertEqual(picture.srcset, ', '.join(
+            f'{registered[width, "JPEG"].url} {width}w'
+            for width in settings.POST_IMAGE_WIDTHS
+        ))
+        self.assertEqual(
+            [source['type'] for source in picture.sources], ['image/webp']
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPrefetchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пост {number}',
+                image=png(f'prefetch_{number}.png'),
+            )
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear()
+        self.registered = [register(post.image) for post in self.posts]
+        cache.clear()
+        default.kvstore.clear_memo()
+
+    def test_page_reads_kvstore_once(self):
+        """Проверяем, что миниатюры всей страницы читаются из базы
+        одним запросом."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(len(kvstore_queries(queries)), 1)
+        for registered in self.registered:
+            for thumbnail in registered.values():
+                with self.subTest(thumbnail=thumbnail.name):
+                    self.assertContains(response, thumbnail.url)
+
+    def test_get_many_uses_cache_and_memo(self):
+        """Проверяем, что повторное чтение метаданных обходится без
+        базы, а после очистки памяти процесса — берётся из кэша."""
+        images = [post.image for post in self.posts]
+        expected = {
+            post.image.name: sorted(
+                thumbnail.url for thumbnail in registered.values()
+            )
+            for post, registered in zip(self.posts, self.registered)
+        }
+
+        def urls():
+            return {
+                name: sorted(
+                    thumbnail.url for thumbnail in variants.values()
+                )
+                for name, variants in thumbnails.prefetch(images).items()
+            }
+
+        with self.assertNumQueries(1):
+            self.assertEqual(urls(), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(urls(), expected)
+        default.kvstore.clear_memo()
+        with self.assertNumQueries(0):
+            self.assertEqual(urls(), expected)
+
+    def test_missing_thumbnail_not_remembered(self):
+        """Проверяем, что отсутствие миниатюры не запоминается в памяти
+        процесса."""
+        image = png('missing.png')
+        post = Post.objects.create(author=self.user, text='Пост', image=image)
+        self.assertIsNone(thumbnails.picture(post.image))
+        registered = register(post.image)
+        self.assertEqual(
+            thumbnails.picture(post.image).src,
+            registered[960, 'JPEG'].url,
+        )
+
+    def test_thumbnail_lists_not_remembered(self):
+        """Проверяем, что список миниатюр оригинала всегда читается из
+        кэша: другой процесс мог его дополнить."""
+        source = thumbnails.source(self.posts[0].image.name)
+        default.kvstore._set(source.key, ['old'], identity='thumbnails')
+        self.assertEqual(
+            default.kvstore._get(source.key, identity='thumbnails'), ['old']
+        )
+        KVStore()._set(source.key, ['old', 'new'], identity='thumbnails')
+        self.assertEqual(
+            default.kvstore._get(source.key, identity='thumbnails'),
+            ['old', 'new'],
+        )
+
+    @override_settings(THUMBNAIL_L1_TIMEOUT=0)
+    def test_memo_expires(self):
+        """Проверяем, что запись, удалённая другим процессом, перестаёт
+        читаться из памяти процесса по истечении THUMBNAIL_L1_TIMEOUT."""
+        thumbnail = self.registered[0][960, 'JPEG']
+        self.assertIsNotNone(default.kvstore.get(thumbnail))
+        KVStore().delete(thumbnail)
+        self.assertIsNone(default.kvstore.get(thumbnail))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailScheduleTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_thumbnails_generated_after_save(self):
+        """Проверяем, что миниатюры создаются после сохранения поста
+        с картинкой и только для него."""
+        author = User.objects.create_user(username='auth')
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            Post.objects.create(author=author, text='Без картинки')
+            post = Post.objects.create(
+                author=author,
+                text='Тестовый пост',
+                image=png('scheduled.png'),
+            )
+        generate.assert_called_once_with(post.image.name)
+
+    def test_failed_image_not_retried_until_delay(self):
+        """Проверяем, что после неудачи страницы не создают миниатюры
+        картинки снова, пока не пройдёт пауза."""
+        author = User.objects.create_user(username='auth')
+        broken = mock.patch.object(
+            thumbnails, 'get_thumbnail', side_effect=OSError('broken')
+        )
+        with broken as get_thumbnail, self.assertLogs(thumbnails.logger):
+            post = Post.objects.create(
+                author=author, text='Тестовый пост', image=png('broken.png')
+            )
+            self.assertEqual(get_thumbnail.call_count, 1)
+            self.client.get(reverse('posts:index'))
+            self.client.get(reverse('posts:index'))
+            self.assertEqual(get_thumbnail.call_count, 1)
+            with mock.patch.object(thumbnails.time, 'time',
+                                   return_value=time.time() + 61):
+                self.client.get(reverse('posts:index'))
+            self.assertEqual(get_thumbnail.call_count, 2)
+        failures, _ = cache.get(
+            thumbnails.FAILED_KEY.format(post.image.name)
+        )
+        self.assertEqual(failures, 2)
+
+    def test_thumbnails_not_generated_on_rollback(self):
+        """Проверяем, что откат транзакции не ставит миниатюры
+        в очередь."""
+        author = User.objects.create_user(username='auth')
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            with transaction.atomic():
+                Post.objects.create(
+                    author=author,
+                    text='Тестовый пост',
+                    image=png('rolled_back.png'),
+                )
+                transaction.set_rollback(True)
+        generate.assert_not_called()
@@ -0,0 +1,194 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, Timeline, User, UserStats
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def timeline_posts(self):
+        return list(
+            Timeline.objects.filter(user=TimelineTests.reader)
+            .values_list('post_id', flat=True)
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Проверяем, что подписка заполняет ленту, а отписка чистит её."""
+        follow = Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author,
+        )
+        self.assertEqual(self.timeline_posts(), [TimelineTests.old_post.id])
+        follow.delete()
+        self.assertEqual(self.timeline_posts(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Проверяем, что новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author,
+        )
+        post = Post.objects.create(
+            author=TimelineTests.author,
+            text='Новый пост',
+        )
+        self.assertEqual(
+            self.timeline_posts(),
+            [post.id, TimelineTests.old_post.id]
+        )
+
+    def test_rebuild_command(self):
+        """Проверяем, что команда пересобирает ленты из подписок."""
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author,
+        )
+        Timeline.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_posts(), [TimelineTests.old_post.id])
+
+    def test_rebuild_set_based(self):
+        """Проверяем, что пересборка не зависит по числу запросов от числа
+        подписок и не трогает посты горячих авторов."""
+        hot = User.objects.create_user(username='hot')
+        Post.objects.create(author=hot, text='Пост горячего автора')
+        UserStats.objects.filter(user=hot).update(hot=True)
+        for username in ('first', 'second', 'third'):
+            reader = User.objects.create_user(username=username)
+            Follow.objects.create(user=reader, author=TimelineTests.author)
+            Follow.objects.create(user=reader, author=hot)
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author,
+        )
+        Timeline.objects.all().delete()
+        with self.assertNumQueries(5):
+            self.assertEqual(timeline.rebuild(), 4)
+        self.assertEqual(
+            sorted(Timeline.objects.values_list('post_id', flat=True)),
+            [TimelineTests.old_post.id] * 4,
+        )
+        with self.assertNumQueries(5):
+            self.assertEqual(timeline.rebuild([TimelineTests.reader.id]), 1)
+        self.assertEqual(self.timeline_posts(), [TimelineTests.old_post.id])
+
+    @override_settings(FANOUT_FOLLOWER_THRESHOLD=1)
+    def test_author_leaving_hot_set_backfilled(self):
+        """Проверяем, что ленты подписчиков автора, вышедшего из горячих,
+        дозаполняются, даже если множество пропало из кэша."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author,
+        )
+        Follow.objects.create(user=other, author=TimelineTests.author)
+        timeline.refresh_hot_authors()
+        self.assertTrue(UserStats.objects.get(user=TimelineTests.author).hot)
+        post = Post.objects.create(
+            author=TimelineTests.author,
+            text='Пост горячего автора',
+        )
+        self.assertNotIn(post.id, self.timeline_posts())
+        cache.clear()
+        Follow.objects.filter(user=other).delete()
+        # Запрос только читает отметки из базы и ничего не дозаполняет.
+        self.assertEqual(
+            timeline.hot_author_ids(), frozenset([TimelineTests.author.id])
+        )
+        self.assertNotIn(post.id, self.timeline_posts())
+        out = StringIO()
+        call_command('refresh_hot_authors', stdout=out)
+        self.assertIn('Авторов без раскладки по лентам: 0', out.getvalue())
+        self.assertEqual(timeline.hot_author_ids(), frozenset())
+        self.assertIn(post.id, self.timeline_posts())
+        self.assertFalse(UserStats.objects.get(user=TimelineTests.author).hot)
+
+    @override_settings(FANOUT_FOLLOWER_THRESHOLD=1)
+    def test_refresh_locked(self):
+        """Проверяем, что пересчёт не идёт, пока его держит другой
+        процесс, и что чтение множества ничего не пишет."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=TimelineTests.author)
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author,
+        )
+        cache.delete(timeline.HOT_AUTHORS_KEY)
+        cache.add(timeline.HOT_AUTHORS_LOCK_KEY, True)
+        self.assertIsNone(timeline.refresh_hot_authors())
+        with self.assertNumQueries(1):
+            self.assertEqual(timeline.hot_author_ids(), frozenset())
+        cache.delete(timeline.HOT_AUTHORS_LOCK_KEY)
+        self.assertEqual(
+            timeline.refresh_hot_authors(),
+            frozenset([TimelineTests.author.id]),
+        )
+        self.assertIsNone(cache.get(timeline.HOT_AUTHORS_LOCK_KEY))
+
+    @override_settings(FANOUT_FOLLOWER_THRESHOLD=1)
+    def test_hot_author_merged_at_read_time(self):
+        """Проверяем, что посты горячего автора не раскладываются,
+        а подмешиваются в ленту при чтении."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=TimelineTests.reader, author=other)
+        Follow.objects.create(
+            user=TimelineTests.reader,
+            author=TimelineTests.author,
+        )
+        Follow.objects.create(user=other, author=TimelineTests.author)
+        other_post = Post.objects.create(author=other, text='Обычный пост')
+        timeline.refresh_hot_authors()
+        post = Post.objects.create(
+            author=TimelineTests.author,
+            text='Пост горячего автора',
+        )
+        self.assertNotIn(post.id, self.timeline_posts())
+        self.assertIsInstance(
+            timeline.follow_feed(TimelineTests.reader), timeline.FollowFeed
+        )
+        client = Client()
+        client.force_login(TimelineTests.reader)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [post, other_post, TimelineTests.old_post]
+        )
+
+
+class TimelineMigrationTests(TransactionTestCase):
+    def test_migration_fills_timelines(self):
+        """Проверяем, что миграция заполняет ленты по существующим
+        подпискам."""
+        author = User.objects.create_user(username='auth')
+        reader = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=author, text='Тестовый пост')
+        Follow.objects.create(user=reader, author=author)
+        call_command('migrate', 'posts', '0020', verbosity=0)
+        Timeline.objects.all().delete()
+        call_command('migrate', 'posts', verbosity=0)
+        self.assertEqual(
+            list(Timeline.objects.values_list('user_id', 'post_id')),
+            [(reader.id, post.id)],
+        )
@@ -0,0 +1,148 @@
+import io
+import shutil
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import uploads
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
+MAKE = 0x010F
+
+
+def jpeg(name, size, orientation=None):
+    """JPEG с EXIF: производитель камеры и, если задана, ориентация."""
+    exif = Image.Exif()
+    exif[MAKE] = 'Camera'
+    if orientation is not None:
+        exif[ORIENTATION] = orientation
+    content = io.BytesIO()
+    Image.new('RGB', size, (10, 120, 200)).save(
+        content, 'JPEG', exif=exif.tobytes()
+    )
+    return SimpleUploadedFile(name, content.getvalue(), 'image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    IMAGE_MAX_SIZE=(200, 200),
+    IMAGE_WORKERS=0,
+)
+class UploadNormalizationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(UploadNormalizationTests.user)
+
+    def assertNormalized(self, content, size):
+        with Image.open(io.BytesIO(content)) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, size)
+            self.assertNotIn('exif', image.info)
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_normalize_rotates_caps_and_strips(self):
+        """Проверяем, что картинка поворачивается по EXIF, уменьшается
+        до IMAGE_MAX_SIZE и теряет метаданные."""
+        normalized = uploads.normalize(
+            jpeg('rotated.jpg', (400, 100), orientation=6)
+        )
+        self.assertEqual(normalized.name, 'rotated.jpg')
+        self.assertEqual((normalized.width, normalized.height), (50, 200))
+        self.assertNormalized(normalized.read(), (50, 200))
+
+    def test_small_image_keeps_size(self):
+        """Проверяем, что маленькая картинка не увеличивается."""
+        normalized = uploads.normalize(jpeg('small.jpg', (40, 30)))
+        self.assertEqual((normalized.width, normalized.height), (40, 30))
+        self.assertNormalized(normalized.read(), (40, 30))
+
+    def test_post_records_image_meta(self):
+        """Проверяем, что пост хранит нормализованную картинку, её
+        размеры и размер файла."""
+        self.authorized_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': jpeg('upload.jpg', (1000, 500)),
+        })
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual((post.image_width, post.image_height), (200, 100))
+        self.assertEqual(
+            post.image_bytes, default_storage.size(post.image.name)
+        )
+        with post.image.open() as stored:
+            self.assertNormalized(stored.read(), (200, 100))
+
+    def test_edit_without_image_clears_meta(self):
+        """Проверяем, что удаление картинки сбрасывает её размеры."""
+        post = Post.objects.create(
+            author=UploadNormalizationTests.user,
+            text='Пост',
+            image=jpeg('clear.jpg', (40, 30)),
+            image_width=40,
+            image_height=30,
+            image_bytes=100,
+        )
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Пост', 'image-clear': 'on'},
+        )
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+        self.assertIsNone(post.image_width)
+        self.assertIsNone(post.image_bytes)
+
+    @override_settings(IMAGE_WORKERS=1)
+    def test_normalize_in_process_pool(self):
+        """Проверяем нормализацию в пуле процессов."""
+        self.addCleanup(uploads._reset_pool)
+        normalized = uploads.normalize(
+            jpeg('pool.jpg', (400, 100), orientation=6)
+        )
+        self.assertEqual((normalized.width, normalized.height), (50, 200))
+
+    @override_settings(IMAGE_WORKERS=1, IMAGE_QUEUE=1, IMAGE_TIMEOUT=0.01)
+    def test_queue_slot_held_until_worker_finishes(self):
+        """Проверяем, что место в очереди занято, пока процесс пула
+        работает, даже если запрос перестал ждать, и что смена пула
+        не заменяет очередь."""
+        self.addCleanup(setattr, uploads, '_slots', None)
+        uploads._slots = None
+        running = Future()
+        running.set_running_or_notify_cancel()
+        done = Future()
+        done.set_result((b'data', 1, 1))
+        executor = mock.Mock()
+        executor.submit.side_effect = [running, done]
+        with mock.patch.object(uploads, '_pool', return_value=executor):
+            with self.assertRaises(FutureTimeoutError):
+                uploads._run(b'first')
+            with self.assertRaises(FutureTimeoutError):
+                uploads._run(b'second')
+            self.assertEqual(executor.submit.call_count, 1)
+            slots = uploads._queue()
+            uploads._reset_pool()
+            self.assertIs(uploads._queue(), slots)
+            running.set_result((b'data', 1, 1))
+            self.assertEqual(uploads._run(b'third'), (b'data', 1, 1))
+        # Все места свободны: лишнее освобождение было бы ошибкой.
+        with self.assertRaises(ValueError):
+            slots.release()
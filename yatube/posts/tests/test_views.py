@@ -3,7 +3,6 @@ import tempfile
 
 from django import forms
 from django.conf import settings
-from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
@@ -259,20 +258,37 @@ class PostsViewsTests(TestCase):
                 self.assertIsInstance(form_field, expected_field)
 
     def test_avialable_cached_post(self):
-        """Проверяем, что пост доступен из кэша после удаления"""
+        """Проверяем, что лента берётся из кэша, пока посты не менялись,
+        и кэш сбрасывается сразу после изменения постов"""
         content_before = self.authorized_client.get(
             PostsViewsTests.NAME_TEMPL['INDEX'][0]
         ).content
-        Post.objects.all().delete()
-        content_after = self.authorized_client.get(
+        # update() не отправляет сигналов, поэтому поколение не меняется.
+        Post.objects.update(text='Изменено в обход сигналов')
+        content_cached = self.authorized_client.get(
             PostsViewsTests.NAME_TEMPL['INDEX'][0]
         ).content
-        self.assertEqual(content_before, content_after)
-        cache.clear()
-        content_clear_cache = self.authorized_client.get(
+        self.assertEqual(content_before, content_cached)
+        Post.objects.all().delete()
+        content_after = self.authorized_client.get(
             PostsViewsTests.NAME_TEMPL['INDEX'][0]
         ).content
-        self.assertNotEqual(content_after, content_clear_cache)
+        self.assertNotEqual(content_cached, content_after)
+
+    def test_group_and_profile_cache_follow_generation(self):
+        """Проверяем, что кэш страниц группы и профиля сбрасывается
+        при создании поста"""
+        for name in ('GROUP_LIST', 'PROFILE'):
+            with self.subTest(name=name):
+                url = PostsViewsTests.NAME_TEMPL[name][0]
+                self.authorized_client.get(url)
+                post = Post.objects.create(
+                    author=PostsViewsTests.user,
+                    text=f'Новый пост {name}',
+                    group=PostsViewsTests.group,
+                )
+                response = self.authorized_client.get(url)
+                self.assertContains(response, post.text)
 
     def test_follow_auth_client(self):
         """Проверяем, что только авторизованный пользователь может
@@ -0,0 +1,21 @@
+from django.urls import reverse
+
+from posts.queries import QueryLog, budget_for
+
+
+class QueryBudgetMixin:
+    """Проверка числа запросов view по бюджету из settings.QUERY_BUDGETS."""
+
+    def assertQueryBudget(self, client, url_name, *args, data=None):
+        with QueryLog() as log:
+            response = client.get(reverse(url_name, args=args), data)
+        budget = budget_for(url_name)
+        self.assertIsNotNone(budget, f'Не задан бюджет запросов {url_name}')
+        self.assertLessEqual(
+            log.count, budget,
+            '\n'.join([f'{url_name} превысил бюджет запросов:'] + [
+                sql for sql, duration in log.queries
+            ]),
+        )
+        self.assertEqual(log.repeated(), {}, f'Возможный N+1 в {url_name}')
+        return response
@@ -0,0 +1,267 @@
+"""Миниатюры картинок постов.
+
+Для каждой картинки готовятся варианты нескольких ширин
+(settings.POST_IMAGE_WIDTHS) в нескольких форматах
+(settings.POST_IMAGE_FORMATS) — в фоновом пуле потоков сразу после
+сохранения поста. Шаблоны выводят только готовые варианты (тег
+post_picture) через <picture> с srcset/sizes, а до их появления
+показывают заглушку: декодирование и масштабирование оригинала не
+выполняются в запросе читателя.
+
+Неудачная попытка отмечается в кэше, и до истечения паузы страницы не
+ставят картинку в очередь снова; пауза удваивается с каждой неудачей
+(settings.THUMBNAIL_RETRY_DELAY, не больше THUMBNAIL_RETRY_MAX).
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+# Картинки, миниатюры которых уже в очереди: повторные запросы страницы
+# не ставят задачу ещё раз.
+_pending = set()
+# (число неудач подряд, время следующей попытки) для картинки.
+FAILED_KEY = 'thumbnails:failed:{}'
+
+
+def thumbnail_file(source, geometry, options):
+    """Файл миниатюры, под которым sorl-thumbnail сохранит её.
+
+    Повторяет разбор параметров из ThumbnailBackend.get_thumbnail(), но не
+    обращается к файлам: имя вычисляется из имени оригинала и параметров.
+    """
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+class Variant(namedtuple('Variant', ('width', 'height', 'format'))):
+    """Вариант миниатюры: ширина и высота в пикселях и формат файла."""
+
+    @property
+    def geometry(self):
+        return f'{self.width}x{self.height}'
+
+    @property
+    def options(self):
+        return {**settings.POST_IMAGE_OPTIONS, 'format': self.format}
+
+    @property
+    def mime_type(self):
+        return f'image/{self.format.lower()}'
+
+
+class Picture:
+    """Готовые варианты картинки для <picture>: srcset по форматам.
+
+    Последний формат из settings.POST_IMAGE_FORMATS идёт в <img> как
+    запасной для браузеров, не знающих остальные.
+    """
+
+    def __init__(self, variants):
+        *formats, fallback = settings.POST_IMAGE_FORMATS
+        self.sizes = settings.POST_IMAGE_SIZES
+        self.sources = []
+        for format_ in formats:
+            ready = self._ready(variants, format_)
+            if ready:
+                self.sources.append({
+                    'type': ready[0][0].mime_type,
+                    'srcset': self._srcset(ready),
+                })
+        ready = self._ready(variants, fallback)
+        self.srcset = self._srcset(ready)
+        if ready:
+            largest = ready[-1][1]
+            self.src = largest.url
+            self.width, self.height = largest.width, largest.height
+
+    @staticmethod
+    def _ready(variants, format_):
+        """Готовые варианты формата format_ по возрастанию ширины."""
+        return sorted(
+            (
+                (variant, thumbnail)
+                for variant, thumbnail in variants.items()
+                if thumbnail is not None and variant.format == format_
+            ),
+            key=lambda pair: pair[0].width,
+        )
+
+    @staticmethod
+    def _srcset(ready):
+        return ', '.join(
+            f'{thumbnail.url} {variant.width}w'
+            for variant, thumbnail in ready
+        )
+
+    def __bool__(self):
+        return bool(self.srcset)
+
+
+def source(name):
+    """Оригинал name как ImageFile в хранилище картинок постов.
+
+    Ключ оригинала в sorl-thumbnail включает хранилище: создание,
+    поиск и удаление миниатюр должны получать один и тот же ImageFile.
+    """
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def variants():
+    """Варианты миниатюр: каждая ширина в каждом формате.
+
+    Пропорции всех вариантов совпадают с settings.POST_IMAGE_SIZE.
+    """
+    box_width, box_height = settings.POST_IMAGE_SIZE
+    for width in settings.POST_IMAGE_WIDTHS:
+        height = round(width * box_height / box_width)
+        for format_ in settings.POST_IMAGE_FORMATS:
+            yield Variant(width, height, format_)
+
+
+def prefetch(images):
+    """Готовые варианты картинок images: {имя: {вариант: миниатюра}}.
+
+    Метаданные всех вариантов читаются из хранилища ключей одним
+    обращением. Отсутствующий вариант попадает в результат как None, а
+    его картинка ставится в очередь на создание миниатюр.
+    """
+    files = {
+        image.name: {
+            variant: thumbnail_file(
+                source(image.name), variant.geometry, variant.options
+            )
+            for variant in variants()
+        }
+        for image in images
+        if image
+    }
+    every_file = [
+        file for image_files in files.values()
+        for file in image_files.values()
+    ]
+    kvstore = default.kvstore
+    if hasattr(kvstore, 'get_many'):
+        found = kvstore.get_many(every_file)
+    else:
+        found = {file.key: kvstore.get(file) for file in every_file}
+    ready = {}
+    for name, image_files in files.items():
+        ready[name] = {
+            variant: found.get(file.key)
+            for variant, file in image_files.items()
+        }
+    incomplete = [name for name in ready if None in ready[name].values()]
+    if incomplete:
+        failed = cache.get_many(map(FAILED_KEY.format, incomplete))
+        for name in incomplete:
+            _, retry_at = failed.get(FAILED_KEY.format(name), (0, 0))
+            if retry_at <= time.time():
+                schedule(name)
+    return ready
+
+
+def picture(image):
+    """Готовые варианты одной картинки (Picture) или None."""
+    if not image:
+        return None
+    return Picture(prefetch([image])[image.name]) or None
+
+
+def _failed(name):
+    """Отмечает неудачу: следующая попытка — после паузы."""
+    key = FAILED_KEY.format(name)
+    failures, _ = cache.get(key, (0, 0))
+    failures += 1
+    delay = min(
+        settings.THUMBNAIL_RETRY_DELAY * 2 ** (failures - 1),
+        settings.THUMBNAIL_RETRY_MAX,
+    )
+    # Отметка живёт дольше паузы, чтобы счёт неудач не сбрасывался.
+    cache.set(
+        key, (failures, time.time() + delay),
+        settings.THUMBNAIL_RETRY_MAX * 2,
+    )
+    return failures, delay
+
+
+def generate(name):
+    """Создаёт все варианты миниатюр картинки name."""
+    try:
+        for variant in variants():
+            get_thumbnail(
+                source(name), variant.geometry, **variant.options
+            )
+    except Exception:
+        failures, delay = _failed(name)
+        logger.exception(
+            'Не удалось создать миниатюры %s (попытка %d), '
+            'следующая через %d с', name, failures, delay,
+        )
+    else:
+        cache.delete(FAILED_KEY.format(name))
+    finally:
+        _pending.discard(name)
+
+
+def _work(name):
+    try:
+        generate(name)
+    finally:
+        # У потока пула своё соединение с базой (хранилище ключей
+        # sorl-thumbnail); закрываем, чтобы оно не висело между задачами.
+        connection.close()
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def _submit(name):
+    if name in _pending:
+        return
+    _pending.add(name)
+    if settings.THUMBNAIL_WORKERS:
+        _pool().submit(_work, name)
+    else:
+        generate(name)
+
+
+def schedule(name):
+    """Ставит создание миниатюр в очередь после фиксации транзакции.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры создаются сразу, в текущем потоке.
+    """
+    transaction.on_commit(lambda: _submit(name))
@@ -0,0 +1,333 @@
+"""Материализованные ленты подписок (гибридный fan-out).
+
+Новый пост обычного автора раскладывается в Timeline всех его
+подписчиков, поэтому страница подписок читается одним диапазоном по
+индексу (user, -pub_date) без соединения с Follow.
+
+Авторы, у которых подписчиков больше FANOUT_FOLLOWER_THRESHOLD, в ленты
+не раскладываются: их посты подмешиваются при чтении из списка последних
+постов автора, который хранится в кэше. Само множество таких авторов
+хранится в базе (UserStats.hot), а в кэше лежит лишь его копия на
+HOT_AUTHORS_TIMEOUT. Запросы только читают отметки; пересчитывает их
+команда refresh_hot_authors (по расписанию), она же дозаполняет ленты
+подписчиков авторов, вышедших из множества.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .following import followed_authors
+from .models import Follow, Post, Timeline, UserStats
+from .utils import FORWARD
+
+HOT_AUTHORS_KEY = 'timeline:hot_authors'
+# Пересчёт идёт в одном процессе: второй запуск, пока первый не снял
+# блокировку (или она не истекла), ничего не делает.
+HOT_AUTHORS_LOCK_KEY = 'timeline:hot_authors:lock'
+HOT_AUTHORS_LOCK_TIMEOUT = 60 * 60
+RECENT_POSTS_KEY = 'timeline:recent:{}'
+# Заполнение лент одним INSERT ... SELECT: каждой подписке на обычного
+# автора — его последние TIMELINE_BACKFILL постов.
+FILL = '''
+    INSERT INTO posts_timeline (user_id, post_id, author_id, pub_date)
+    SELECT posts_follow.user_id, recent.id, recent.author_id, recent.pub_date
+    FROM posts_follow
+    JOIN (
+        SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+            PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+        ) AS position
+        FROM posts_post
+    ) AS recent ON recent.author_id = posts_follow.author_id
+    WHERE recent.position <= %s
+        AND posts_follow.author_id NOT IN (
+            SELECT user_id FROM posts_userstats WHERE hot = %s
+        )
+'''
+# Раскладка уже сохранённых постов одним INSERT ... SELECT по подписчикам
+# их авторов; посты горячих авторов не раскладываются.
+DISTRIBUTE = '''
+    {insert} posts_timeline (user_id, post_id, author_id, pub_date)
+    SELECT posts_follow.user_id, posts_post.id, posts_post.author_id,
+        posts_post.pub_date
+    FROM posts_post
+    JOIN posts_follow ON posts_follow.author_id = posts_post.author_id
+    WHERE posts_post.id IN ({placeholders})
+        AND posts_post.author_id NOT IN (
+            SELECT user_id FROM posts_userstats WHERE hot = %s
+        )
+    {suffix}
+'''
+# Читателей в одном условии IN при пересборке части лент.
+REBUILD_BATCH = 500
+
+
+def _entries(user_ids, posts, author_id):
+    for user_id in user_ids:
+        for post_id, pub_date in posts:
+            yield Timeline(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+
+
+def _write(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.TIMELINE_BATCH_SIZE:
+            Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _followers(author_id):
+    return (
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+        .iterator()
+    )
+
+
+def recent_posts(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    )
+
+
+def recent_keys(author_id):
+    """Последние посты автора как список ключей (pub_date, id) по убыванию.
+
+    Список живёт в кэше и сбрасывается при создании и удалении постов.
+    """
+    key = RECENT_POSTS_KEY.format(author_id)
+    keys = cache.get(key)
+    if keys is None:
+        keys = [(pub_date, pk) for pk, pub_date in recent_posts(author_id)]
+        cache.set(key, keys, settings.FEED_CACHE_TIMEOUT)
+    return keys
+
+
+def forget_recent(author_id):
+    cache.delete(RECENT_POSTS_KEY.format(author_id))
+
+
+def marked_hot_authors():
+    """Авторы, отмеченные в базе как «горячие»."""
+    return frozenset(
+        UserStats.objects.filter(hot=True).values_list('user_id', flat=True)
+    )
+
+
+def refresh_hot_authors():
+    """Пересчитывает множество авторов, посты которых не раскладываются.
+
+    Пока автор был «горячим», его посты не попадали в ленты, поэтому
+    для авторов, вышедших из множества, ленты подписчиков дозаполняются.
+    Отметка автора снимается сразу после дозаполнения его лент: если
+    пересчёт прервётся, следующий продолжит с оставшихся. Возвращает
+    новое множество или None, если пересчёт уже идёт в другом процессе.
+    """
+    if not cache.add(HOT_AUTHORS_LOCK_KEY, True, HOT_AUTHORS_LOCK_TIMEOUT):
+        return None
+    try:
+        threshold = settings.FANOUT_FOLLOWER_THRESHOLD
+        stats = UserStats.objects.all()
+        rows = stats.filter(
+            Q(followers_count__gt=threshold) | Q(hot=True)
+        ).values_list('user_id', 'followers_count', 'hot')
+        hot, marked = set(), set()
+        for user_id, followers_count, is_hot in rows:
+            if followers_count > threshold:
+                hot.add(user_id)
+            if is_hot:
+                marked.add(user_id)
+        hot = frozenset(hot)
+        if hot - marked:
+            stats.filter(user_id__in=hot - marked).update(hot=True)
+        for author_id in marked - hot:
+            _write(_entries(
+                _followers(author_id), recent_posts(author_id), author_id
+            ))
+            stats.filter(user_id=author_id).update(hot=False)
+        cache.set(HOT_AUTHORS_KEY, hot, settings.HOT_AUTHORS_TIMEOUT)
+        return hot
+    finally:
+        cache.delete(HOT_AUTHORS_LOCK_KEY)
+
+
+def hot_author_ids():
+    """Множество «горячих» авторов: из кэша или по отметкам в базе."""
+    hot = cache.get(HOT_AUTHORS_KEY)
+    if hot is None:
+        hot = marked_hot_authors()
+        cache.set(HOT_AUTHORS_KEY, hot, settings.HOT_AUTHORS_TIMEOUT)
+    return hot
+
+
+def distribute(post):
+    """Записывает пост в ленты всех подписчиков автора."""
+    _write(_entries(
+        _followers(post.author_id),
+        [(post.id, post.pub_date)],
+        post.author_id,
+    ))
+
+
+def distribute_posts(post_ids):
+    """Записывает посты post_ids в ленты подписчиков их авторов.
+
+    Для пакетной загрузки: одним запросом на весь список, поэтому
+    вызывающий сам ограничивает его длину (число параметров запроса).
+    """
+    if not post_ids:
+        return
+    ops = connection.ops
+    sql = DISTRIBUTE.format(
+        insert=ops.insert_statement(ignore_conflicts=True),
+        placeholders=', '.join(['%s'] * len(post_ids)),
+        suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*post_ids, True])
+
+
+def fan_out(post):
+    """Раскладывает новый пост, если его автор не «горячий»."""
+    forget_recent(post.author_id)
+    if post.author_id not in hot_author_ids():
+        distribute(post)
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту читателя последними постами нового автора."""
+    if author_id in hot_author_ids():
+        return
+    _write(_entries([user_id], recent_posts(author_id), author_id))
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _fill(user_ids=None):
+    sql, params = FILL, [settings.TIMELINE_BACKFILL, True]
+    if user_ids is not None:
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        sql += f' AND posts_follow.user_id IN ({placeholders})'
+        params += list(user_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Пересобирает ленты из Follow и Post.
+
+    Без аргументов пересобирает все ленты, иначе только ленты
+    перечисленных читателей. Ленты удаляются и заполняются заново
+    запросами INSERT ... SELECT в одной транзакции: читатели не видят их
+    пустыми. Возвращает число обработанных подписок.
+    """
+    follows = Follow.objects.exclude(author__stats__hot=True)
+    if user_ids is None:
+        Timeline.objects.all().delete()
+        _fill()
+        return follows.count()
+    processed = 0
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), REBUILD_BATCH):
+        batch = user_ids[start:start + REBUILD_BATCH]
+        Timeline.objects.filter(user_id__in=batch).delete()
+        _fill(batch)
+        processed += follows.filter(user_id__in=batch).count()
+    return processed
+
+
+class FollowFeed:
+    """Лента подписок: Timeline читателя, слитая со списками горячих авторов.
+
+    Поддерживает контракт Paginator (count() и срезы) и CursorPaginator
+    (window()). Ключи страницы читаются диапазоном по индексу Timeline,
+    затем посты загружаются одним запросом по id.
+    """
+
+    def __init__(self, user_id, hot_author_ids, posts=None):
+        # posts — из какого QuerySet загружать посты страницы; у строк
+        # должен быть атрибут id (модели или values_list(named=True)).
+        if posts is None:
+            posts = Post.objects.select_related('group', 'author')
+        self.posts = posts
+        self.timeline = Timeline.objects.filter(user_id=user_id)
+        if hot_author_ids:
+            self.timeline = self.timeline.exclude(author_id__in=hot_author_ids)
+        self.recent = [recent_keys(author_id) for author_id in hot_author_ids]
+
+    def count(self):
+        return self.timeline.count() + sum(map(len, self.recent))
+
+    def _timeline_keys(self, queryset, limit):
+        return list(queryset.values_list('pub_date', 'post_id')[:limit])
+
+    def _posts(self, keys):
+        ids = [pk for _, pk in keys]
+        rows = self.posts.filter(pk__in=ids).order_by()
+        posts = {post.id: post for post in rows}
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        rows = self._timeline_keys(
+            self.timeline.order_by('-pub_date', '-post_id'), stop
+        )
+        merged = heapq.merge(rows, *self.recent, reverse=True)
+        return self._posts(islice(merged, start, stop))
+
+    def window(self, direction, key, limit):
+        if key is None:
+            return self[:limit]
+        pub_date, pk = key
+        if direction == FORWARD:
+            queryset = self.timeline.filter(pub_date__lte=pub_date).exclude(
+                pub_date=pub_date, post_id__gte=pk
+            )
+            rows = self._timeline_keys(
+                queryset.order_by('-pub_date', '-post_id'), limit
+            )
+            recent = [
+                [row for row in keys if row < key] for keys in self.recent
+            ]
+            merged = heapq.merge(rows, *recent, reverse=True)
+        else:
+            queryset = self.timeline.filter(pub_date__gte=pub_date).exclude(
+                pub_date=pub_date, post_id__lte=pk
+            )
+            rows = self._timeline_keys(
+                queryset.order_by('pub_date', 'post_id'), limit
+            )
+            recent = [
+                [row for row in reversed(keys) if row > key]
+                for keys in self.recent
+            ]
+            merged = heapq.merge(rows, *recent)
+        return self._posts(islice(merged, limit))
+
+
+def follow_feed(user, posts=None):
+    """Возвращает ленту подписок пользователя для пагинатора."""
+    hot = hot_author_ids()
+    hot_followed = []
+    if hot:
+        hot_followed = sorted(followed_authors(user).following(hot))
+    return FollowFeed(user.id, hot_followed, posts)
@@ -0,0 +1,150 @@
+"""Нормализация загружаемых картинок постов.
+
+Оригинал уменьшается до settings.IMAGE_MAX_SIZE, поворачивается по
+EXIF-ориентации и пересохраняется в том же формате с качеством
+settings.IMAGE_QUALITY, без EXIF и прочих метаданных. Декодирование
+больших картинок занимает сотни миллисекунд процессора, поэтому идёт в
+пуле из settings.IMAGE_WORKERS процессов: потоки WSGI-сервера только ждут
+результат и не держат GIL. Одновременно в пуле не больше
+settings.IMAGE_QUEUE картинок, остальные загрузки ждут очереди.
+"""
+import io
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+# Параметры сохранения по форматам; прочие форматы сохраняются как есть.
+SAVE_OPTIONS = {
+    'JPEG': {'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'method': 4},
+}
+QUALITY_FORMATS = ('JPEG', 'WEBP')
+JPEG_MODES = ('RGB', 'L', 'CMYK')
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def normalize_bytes(data, max_size, quality):
+    """Нормализует картинку data; возвращает (байты, ширина, высота).
+
+    Выполняется в процессе пула, поэтому не обращается к Django.
+    Анимированные картинки и форматы, которые Pillow не умеет сохранять,
+    возвращаются без изменений: пересохранение оставило бы только первый
+    кадр или не удалось бы вовсе.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        format_ = image.format
+        if (getattr(image, 'is_animated', False)
+                or format_ not in Image.SAVE):
+            return data, image.width, image.height
+        # JPEG декодируется сразу в уменьшенном масштабе: для 40 Мп
+        # оригинала это в разы быстрее и экономнее по памяти. Стороны
+        # после поворота неизвестны, поэтому рамка квадратная.
+        side = max(max_size)
+        image.draft(image.mode, (side, side))
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(max_size, Image.LANCZOS)
+        if format_ == 'JPEG' and image.mode not in JPEG_MODES:
+            image = image.convert('RGB')
+        options = dict(SAVE_OPTIONS.get(format_, {}))
+        if format_ in QUALITY_FORMATS:
+            options['quality'] = quality
+        if icc_profile:
+            options['icc_profile'] = icc_profile
+        output = io.BytesIO()
+        image.save(output, format_, **options)
+        return output.getvalue(), image.width, image.height
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn, а не fork: форк многопоточного WSGI-процесса может
+            # унаследовать захваченные другими потоками блокировки.
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+    return _executor
+
+
+def _queue():
+    """Места в очереди пула; одни на процесс, переживают смену пула."""
+    global _slots
+    with _lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(settings.IMAGE_QUEUE)
+    return _slots
+
+
+def _reset_pool():
+    """Забывает пул, процесс которого упал (например, по памяти)."""
+    global _executor
+    with _lock:
+        broken, _executor = _executor, None
+    if broken is not None:
+        broken.shutdown(wait=False)
+
+
+def _run(data):
+    args = (data, settings.IMAGE_MAX_SIZE, settings.IMAGE_QUALITY)
+    if not settings.IMAGE_WORKERS:
+        return normalize_bytes(*args)
+    slots = _queue()
+    if not slots.acquire(timeout=settings.IMAGE_TIMEOUT):
+        raise FutureTimeoutError
+    try:
+        future = _pool().submit(normalize_bytes, *args)
+    except BrokenProcessPool:
+        slots.release()
+        _reset_pool()
+        raise FutureTimeoutError
+    except RuntimeError:
+        # Упавший пул только что закрыл другой поток.
+        slots.release()
+        raise FutureTimeoutError
+    # Место освобождается, когда процесс пула закончил работу, а не когда
+    # запрос перестал её ждать: иначе очередь не ограничивала бы пул.
+    future.add_done_callback(lambda future: slots.release())
+    try:
+        return future.result(timeout=settings.IMAGE_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        raise
+    except BrokenProcessPool:
+        _reset_pool()
+        raise FutureTimeoutError
+
+
+def normalize(upload):
+    """Нормализованная копия загруженной картинки с тем же именем.
+
+    У результата есть атрибуты width и height; size — размер в байтах.
+    """
+    upload.seek(0)
+    try:
+        data, width, height = _run(upload.read())
+    except FutureTimeoutError:
+        raise ValidationError(
+            'Сервер перегружен, попробуйте загрузить картинку позже.',
+            code='busy',
+        )
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось обработать картинку.', code='invalid_image',
+        )
+    normalized = SimpleUploadedFile(upload.name, data, upload.content_type)
+    normalized.width, normalized.height = width, height
+    return normalized
@@ -1,8 +1,225 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+from collections.abc import Sequence
+
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+
+CURSOR_PARAM = 'cursor'
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(direction, key):
+    """Упаковывает направление и ключ (pub_date, id) в непрозрачный токен."""
+    pub_date, pk = key
+    raw = f'{direction}|{pub_date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора; для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, pub_date, pk = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or pub_date is None:
+        return None
+    return direction, (pub_date, pk)
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации с интерфейсом, совместимым с Page."""
+
+    def __init__(self, object_list, paginator, cursor,
+                 has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self._has_previous = has_previous
+        self._has_next = has_next
+        # Номера страницы у курсора нет, но шаблоны используют его как
+        # ключ кэша, поэтому подставляем сам токен.
+        self.number = cursor or 1
+
+    def __repr__(self):
+        return f'<Cursor page {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+    def next_cursor(self):
+        if not self.has_next() or not self.object_list:
+            return None
+        return self.paginator.make_cursor(FORWARD, self.object_list[-1])
+
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        return self.paginator.make_cursor(BACKWARD, self.object_list[0])
 
 
-def pag(request, post_list):
+class CursorPaginator:
+    """Keyset-пагинатор по убыванию (pub_date, id).
+
+    Не выполняет COUNT(*) и OFFSET: каждая страница читается по индексу
+    начиная с ключа последней (или первой) записи соседней страницы.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page,
+                 date_field='pub_date', id_field='id'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.date_field = date_field
+        self.id_field = id_field
+
+    def make_cursor(self, direction, obj):
+        return encode_cursor(direction, (
+            getattr(obj, self.date_field),
+            getattr(obj, self.id_field),
+        ))
+
+    def _seek(self, queryset, direction, key):
+        # Условие «(pub_date, id) после key» записано как диапазон по
+        # pub_date, чтобы SQLite начинал чтение индекса с ключа, а не
+        # фильтровал его с начала, как было бы с OR.
+        pub_date, pk = key
+        if direction == FORWARD:
+            return queryset.filter(
+                **{f'{self.date_field}__lte': pub_date}
+            ).exclude(
+                **{self.date_field: pub_date, f'{self.id_field}__gte': pk}
+            )
+        return queryset.filter(
+            **{f'{self.date_field}__gte': pub_date}
+        ).exclude(
+            **{self.date_field: pub_date, f'{self.id_field}__lte': pk}
+        )
+
+    def _window(self, direction, key, limit):
+        """Читает до limit объектов после ключа key в направлении direction.
+
+        Источник, не являющийся QuerySet, может реализовать тот же контракт
+        собственным методом window().
+        """
+        window = getattr(self.object_list, 'window', None)
+        if window is not None:
+            return window(direction, key, limit)
+        desc = (f'-{self.date_field}', f'-{self.id_field}')
+        if key is None:
+            return list(self.object_list.order_by(*desc)[:limit])
+        queryset = self._seek(self.object_list, direction, key)
+        if direction == FORWARD:
+            return list(queryset.order_by(*desc)[:limit])
+        asc = (self.date_field, self.id_field)
+        return list(queryset.order_by(*asc)[:limit])
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            rows = self._window(FORWARD, None, self.per_page + 1)
+            return CursorPage(
+                rows[:self.per_page], self, None,
+                has_previous=False,
+                has_next=len(rows) > self.per_page,
+            )
+        direction, key = decoded
+        rows = self._window(direction, key, self.per_page + 1)
+        if direction == FORWARD:
+            return CursorPage(
+                rows[:self.per_page], self, cursor,
+                has_previous=True,
+                has_next=len(rows) > self.per_page,
+            )
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты — отдаём полноценную первую страницу.
+            return self.get_page(None)
+        return CursorPage(
+            rows[:self.per_page][::-1], self, cursor,
+            has_previous=True,
+            has_next=True,
+        )
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который не считает COUNT(*) по всей таблице.
+
+    Без фильтров число строк оценивается по наибольшему первичному ключу:
+    это один шаг по индексу, а удалённые строки лишь добавляют в конец
+    неполные страницы. С фильтрами строки считаются, но не дальше
+    settings.ADMIN_COUNT_LIMIT: полный счёт по миллионам найденных строк
+    всё равно никто не листает.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        limit = settings.ADMIN_COUNT_LIMIT
+        if queryset.query.where:
+            return queryset.order_by()[:limit].count()
+        largest = queryset.order_by().aggregate(largest=Max('pk'))['largest']
+        if not isinstance(largest, int) or largest <= limit:
+            return queryset.order_by()[:limit].count()
+        return largest
+
+
+def use_cursor(request):
+    match = request.resolver_match
+    return (
+        match is not None
+        and match.view_name in settings.CURSOR_PAGINATION_VIEWS
+    )
+
+
+def pag(request, post_list, cursor=None, count=None):
+    """Возвращает страницу ленты.
+
+    Режим выбирается аргументом cursor, а если он не задан — по имени
+    view в settings.CURSOR_PAGINATION_VIEWS. Известное заранее число
+    постов (count) избавляет Paginator от запроса COUNT(*).
+    """
+    if cursor is None:
+        cursor = use_cursor(request)
+    if cursor:
+        paginator = CursorPaginator(post_list, settings.POSTS_PER_PAGE)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
     paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def comments_page(request, comments):
+    """Возвращает страницу комментариев поста, от новых к старым.
+
+    Листается только курсором: за запрос выводится не больше
+    settings.COMMENTS_PER_PAGE комментариев, сколько бы их ни было.
+    """
+    paginator = CursorPaginator(
+        comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        date_field='created',
+    )
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
@@ -1,53 +1,82 @@
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import condition
+
+from . import conditional, export, search as post_search
+from .following import followed_authors
+from .caching import INDEX, author_scope, cache_context, group_scope
+from .counters import stats_for
 from .forms import PostForm, CommentForm
 from .models import Post, Group, User, Follow
-from .utils import pag
+from .timeline import follow_feed
+from .utils import comments_page, pag
 
 
+@condition(
+    etag_func=conditional.index_etag,
+    last_modified_func=conditional.index_last_modified,
+)
 def index(request):
     post_list = Post.objects.all().select_related('group', 'author')
     page_obj = pag(request, post_list)
     context = {
         'page_obj': page_obj,
+        **cache_context(INDEX),
     }
     return render(request, 'posts/index.html', context)
 
 
+@condition(
+    etag_func=conditional.group_etag,
+    last_modified_func=conditional.group_last_modified,
+)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = pag(request, post_list)
+    post_list = group.posts.select_related('author')
+    page_obj = pag(request, post_list, count=group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **cache_context(group_scope(group.slug)),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(
+    etag_func=conditional.profile_etag,
+    last_modified_func=conditional.profile_last_modified,
+)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = pag(request, post_list)
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(
-            user=request.user,
-            author=author,
-        ).exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
     )
+    stats = stats_for(author)
+    post_list = author.posts.select_related('group')
+    page_obj = pag(request, post_list, count=stats.posts_count)
+    following = author.id in followed_authors(request.user)
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        **cache_context(author_scope(author.username)),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('group', 'author__stats'),
+        pk=post_id,
+    )
+    stats_for(post.author)
+    comments = comments_page(request, post.comments.all())
     form = CommentForm()
     context = {
         'post': post,
@@ -57,6 +86,54 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(request, post.comments.all()),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@login_required
+def profile_export(request, username):
+    """Выгрузка постов и комментариев автора: ему самому и персоналу.
+
+    ?format=jsonl|csv выбирает формат, ?images=1 упаковывает выгрузку
+    вместе с картинками в zip. Ответ отдаётся потоком.
+    """
+    author = get_object_or_404(User, username=username)
+    if author != request.user and not request.user.is_staff:
+        raise PermissionDenied
+    export_format = request.GET.get('format', 'jsonl')
+    if export_format not in export.FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    if request.GET.get('images'):
+        extension = 'zip'
+        chunks = export.zip_stream(author, export_format)
+    else:
+        extension = export_format
+        chunks = export.stream(author, export_format)
+    response = StreamingHttpResponse(
+        chunks, content_type=export.CONTENT_TYPES[extension]
+    )
+    response['Content-Disposition'] = export.content_disposition(
+        f'{author.username}.{extension}'
+    )
+    return response
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = pag(request, post_search.search(query), cursor=False)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -77,7 +154,7 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post_id)
     form = PostForm(
         request.POST or None,
@@ -108,7 +185,7 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = follow_feed(request.user)
     page_obj = pag(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -119,6 +196,7 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
+    # Запись идёт мимо кэша подписок: он мог разойтись с Follow.
     if author != request.user:
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:follow_index')
@@ -6,6 +6,13 @@ SECRET_KEY = '!^hb$kdp9z-o#-%ef@zl55uacc9zpt3h+pi&n(239tb6-#lt_i'
 
 DEBUG = True
 
+# Адрес memcached, общего для всех процессов сайта, например
+# 127.0.0.1:11211. Без него кэш у каждого процесса свой (LocMemCache):
+# сброс поколений и версий виден только процессу, который изменил данные,
+# поэтому сроки жизни кэшей ниже сокращаются до секунд.
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION')
+SHARED_CACHE = bool(CACHE_LOCATION)
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -29,6 +36,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.QueryBudgetMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -107,11 +116,132 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 POSTS_PER_PAGE = 10
 
+# Сколько комментариев выводится за один запрос на странице поста
+# и в подгрузке «Показать ещё».
+COMMENTS_PER_PAGE = 20
+
+# Сколько строк за раз читает из базы потоковая выгрузка постов
+# (posts.export).
+EXPORT_CHUNK_SIZE = 2000
+
+# Больше стольких строк списки админки не пересчитывают, см.
+# posts.utils.EstimatedCountPaginator.
+ADMIN_COUNT_LIMIT = 10000
+
+# Ленты, которые листаются курсором по (pub_date, id) вместо номеров страниц.
+# Например: ('posts:index', 'posts:group_list')
+CURSOR_PAGINATION_VIEWS = ()
+
+# Материализованные ленты подписок: сколько последних постов автора
+# попадает в ленту при подписке и размер пачки при раскладке.
+TIMELINE_BACKFILL = 1000
+TIMELINE_BATCH_SIZE = 1000
+
+# Посты авторов, у которых подписчиков больше порога, не раскладываются
+# по лентам, а подмешиваются при чтении. Порог подбирается командой
+# `python manage.py benchmark_fanout`: раскладка поста по 1000 лентам
+# занимает около 36 мс, по 2000 — около 66 мс при бюджете записи 50 мс.
+# Множество таких авторов
+# пересчитывает `python manage.py refresh_hot_authors`, запускаемая по
+# расписанию; HOT_AUTHORS_TIMEOUT — срок его копии в кэше.
+FANOUT_FOLLOWER_THRESHOLD = 1000
+HOT_AUTHORS_TIMEOUT = 60 * 5
+
+# Время жизни закэшированного множества подписок пользователя
+# (posts.following). Оно меняется на месте при подписке и отписке, срок
+# лишь ограничивает жизнь расхождения, если правка кэша потерялась.
+FOLLOWING_TIMEOUT = 60 * 60 * 24 if SHARED_CACHE else 20
+
+# Время жизни кэша лент. Записи сбрасываются сменой поколения при
+# изменении постов, поэтому в общем кэше срок может быть большим.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6 if SHARED_CACHE else 20
+
+# Сколько последних постов попадает в RSS и Atom (posts.feeds).
+FEED_POSTS = 20
+
+# Время жизни готовых карточек постов (posts.cards). Версия поста входит
+# в ключ, поэтому изменённая карточка просто перестаёт читаться.
+CARD_CACHE_TIMEOUT = FEED_CACHE_TIMEOUT
+
+# Кэш готовых страниц лент для анонимных читателей; 0 отключает его.
+PAGE_CACHE_TIMEOUT = FEED_CACHE_TIMEOUT
+
+# Учёт запросов к базе (posts.middleware.QueryBudgetMiddleware): сколько
+# запросов допустимо для GET-запроса к view и сколько одинаковых запросов
+# считать N+1. None — включён при DEBUG на момент запуска сайта (тестовый
+# прогон его выключает).
+QUERY_BUDGET_ENABLED = None
+QUERY_REPEAT_THRESHOLD = 3
+QUERY_BUDGETS = {
+    'posts:index': 5,
+    'posts:group_list': 6,
+    'posts:profile': 7,
+    'posts:post_detail': 6,
+    'posts:post_comments': 2,
+    'posts:post_create': 3,
+    'posts:post_edit': 4,
+    'posts:follow_index': 8,
+    'posts:search': 7,
+    'posts:profile_export': 3,
+    'posts:index_rss': 1,
+    'posts:index_atom': 1,
+    'posts:group_rss': 2,
+    'posts:group_atom': 2,
+    'posts:profile_rss': 2,
+    'posts:profile_atom': 2,
+    'posts:api_index': 3,
+    'posts:api_group_list': 4,
+    'posts:api_profile': 4,
+    'posts:api_follow_index': 5,
+}
+
+# Загруженные картинки уменьшаются до IMAGE_MAX_SIZE и пересохраняются
+# с качеством IMAGE_QUALITY в пуле из IMAGE_WORKERS процессов (0 — в потоке
+# запроса). В пуле не больше IMAGE_QUEUE картинок одновременно; загрузка,
+# не дождавшаяся обработки за IMAGE_TIMEOUT секунд, отклоняется.
+IMAGE_MAX_SIZE = (2560, 2560)
+IMAGE_QUALITY = 85
+IMAGE_WORKERS = 2
+IMAGE_QUEUE = 8
+IMAGE_TIMEOUT = 30
+
+# Миниатюры картинок постов: каждая ширина из POST_IMAGE_WIDTHS в каждом
+# формате из POST_IMAGE_FORMATS, с пропорциями POST_IMAGE_SIZE. Последний
+# формат — запасной для <img>. Создаются после сохранения поста в пуле из
+# THUMBNAIL_WORKERS потоков; 0 — сразу, в потоке запроса.
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+# Ширина картинки на странице для атрибута sizes: колонка контента
+# не шире 960px.
+POST_IMAGE_SIZES = '(min-width: 992px) 960px, 100vw'
+THUMBNAIL_WORKERS = 2
+# После неудачи миниатюры картинки пробуются снова не раньше чем через
+# THUMBNAIL_RETRY_DELAY секунд; пауза удваивается до THUMBNAIL_RETRY_MAX.
+THUMBNAIL_RETRY_DELAY = 60
+THUMBNAIL_RETRY_MAX = 60 * 60 * 24
+# Хранилище ключей sorl-thumbnail: кэш CACHES с запасным чтением из базы,
+# метаданные страницы читаются одним get_many(). Последние
+# THUMBNAIL_L1_SIZE найденных записей картинок держатся в памяти процесса
+# THUMBNAIL_L1_TIMEOUT секунд.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_L1_SIZE = 10000
+THUMBNAIL_L1_TIMEOUT = 60
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_LOCATION,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}